@@ -0,0 +1 @@
+# benchmarks 包初始化文件
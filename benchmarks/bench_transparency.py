@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+水印透明度处理基准测试
+
+对比旧版逐像素 getpixel/putpixel 循环与波段运算实现在不同图片尺寸下的耗时，
+并校验两者输出逐像素一致。
+
+用法（在项目根目录下运行）:
+    python -m benchmarks.bench_transparency
+    python -m benchmarks.bench_transparency --sizes 320x240 1024x768 --repeat 5
+"""
+import argparse
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from src.watermark_tools.watermark_plan import apply_watermark_transparency
+
+
+def legacy_apply_transparency(watermark_layer, transparency):
+    """
+    旧版逐像素透明度调整实现，仅用于对比
+    """
+    width, height = watermark_layer.size
+    transparency_val = max(0, min(100, transparency))
+    alpha_factor = (100 - transparency_val) / 100.0
+    adjusted_watermark = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    for x in range(width):
+        for y in range(height):
+            r, g, b, a = watermark_layer.getpixel((x, y))
+            if a > 0:
+                new_alpha = int(a * alpha_factor)
+                adjusted_watermark.putpixel((x, y), (r, g, b, new_alpha))
+    return adjusted_watermark
+
+
+def build_watermark_layer(width, height):
+    """
+    构造与 add_watermark_to_image 相同形态的整幅水印图层
+    """
+    layer = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(layer)
+    draw.text((10, 10), "2024-01-01 默认水印", font=ImageFont.load_default(), fill=(255, 255, 255))
+    return layer
+
+
+def time_call(func, repeat):
+    """
+    返回多次调用中的最短耗时（秒）及最后一次的结果
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="水印透明度处理基准测试")
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=["320x240", "640x480", "1024x768"],
+        help="测试的图片尺寸，格式为 宽x高 (默认: 320x240 640x480 1024x768)",
+    )
+    parser.add_argument("--transparency", type=int, default=50, help="水印透明度 (默认: 50)")
+    parser.add_argument("--repeat", type=int, default=3, help="新实现的重复次数 (默认: 3)")
+    parser.add_argument("--skip-legacy", action="store_true", help="跳过旧版逐像素实现的计时")
+    args = parser.parse_args()
+
+    print(f"{'尺寸':>12} {'像素数':>12} {'逐像素(s)':>12} {'波段运算(s)':>12} {'加速比':>10}  一致")
+    for size_text in args.sizes:
+        width, height = parse_size(size_text)
+        layer = build_watermark_layer(width, height)
+        fast_time, fast_result = time_call(
+            lambda: apply_watermark_transparency(layer, args.transparency), args.repeat
+        )
+        if args.skip_legacy:
+            print(f"{size_text:>12} {width * height:>12} {'-':>12} {fast_time:>12.4f} {'-':>10}  -")
+            continue
+        legacy_time, legacy_result = time_call(
+            lambda: legacy_apply_transparency(layer, args.transparency), 1
+        )
+        identical = legacy_result.tobytes() == fast_result.tobytes()
+        speedup = legacy_time / fast_time if fast_time else float('inf')
+        print(
+            f"{size_text:>12} {width * height:>12} {legacy_time:>12.4f} "
+            f"{fast_time:>12.4f} {speedup:>9.1f}x  {'是' if identical else '否'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
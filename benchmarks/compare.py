@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+对比两次基准测试结果
+
+按结果标识对应 benchmarks.runner 输出的两个JSON文件，比较各项耗时的中位数，
+变慢超过阈值的项视为性能回退，存在回退时以非零状态退出，便于在持续集成中使用。
+
+用法（在项目根目录下运行）:
+    python -m benchmarks.compare base.json head.json
+    python -m benchmarks.compare base.json head.json --threshold 0.05 --only-changed
+"""
+import argparse
+import json
+import sys
+
+
+def load_results(path):
+    """
+    读取结果文件
+
+    Returns:
+        tuple: (环境信息字典, 以结果标识为键的结果字典)
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("meta", {}), {result["id"]: result for result in data.get("results", [])}
+
+
+def compare_results(base, head, threshold):
+    """
+    比较两组结果中共有的测试项
+
+    Args:
+        base: 基准结果字典
+        head: 对比结果字典
+        threshold: 判定变化的相对阈值，如0.1表示10%
+
+    Returns:
+        list: (结果标识, 基准耗时, 对比耗时, 比值, 状态) 列表，
+              状态为 regression、improvement 或 same
+    """
+    rows = []
+    for result_id, base_result in base.items():
+        head_result = head.get(result_id)
+        if head_result is None:
+            continue
+        base_time = base_result["median"]
+        head_time = head_result["median"]
+        ratio = head_time / base_time if base_time else float("inf")
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 / (1 + threshold):
+            status = "improvement"
+        else:
+            status = "same"
+        rows.append((result_id, base_time, head_time, ratio, status))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比两次基准测试结果")
+    parser.add_argument("base", help="基准结果JSON文件")
+    parser.add_argument("head", help="对比结果JSON文件")
+    parser.add_argument("--threshold", type=float, default=0.1, help="判定变化的相对阈值 (默认: 0.1)")
+    parser.add_argument("--only-changed", action="store_true", help="只显示变化超过阈值的项")
+    args = parser.parse_args()
+
+    base_meta, base = load_results(args.base)
+    head_meta, head = load_results(args.head)
+    for key in ("python", "pillow", "platform", "cpu_count"):
+        if base_meta.get(key) != head_meta.get(key):
+            print(f"注意: 两次运行的环境不同 {key}: {base_meta.get(key)} -> {head_meta.get(key)}")
+    print(f"基准: {base_meta.get('commit')}  对比: {head_meta.get('commit')}")
+
+    labels = {"regression": "变慢", "improvement": "变快", "same": ""}
+    rows = compare_results(base, head, args.threshold)
+    print(f"{'测试项':<64} {'基准(s)':>10} {'对比(s)':>10} {'比值':>8}")
+    for result_id, base_time, head_time, ratio, status in rows:
+        if args.only_changed and status == "same":
+            continue
+        print(f"{result_id:<64} {base_time:>10.4f} {head_time:>10.4f} {ratio:>7.2f}x  {labels[status]}")
+
+    missing = sorted(set(base) ^ set(head))
+    if missing:
+        print(f"有 {len(missing)} 项只出现在其中一个结果中，未参与对比")
+    regressions = sum(1 for row in rows if row[4] == "regression")
+    improvements = sum(1 for row in rows if row[4] == "improvement")
+    print(f"共对比 {len(rows)} 项: 变慢 {regressions} 项，变快 {improvements} 项")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
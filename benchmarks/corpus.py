@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+确定性的合成测试图片集
+
+按尺寸（百万像素）、格式、图片模式以及是否带EXIF的组合生成测试图片，
+相同参数和Pillow版本下生成的文件逐字节一致，便于在不同提交之间对比基准测试结果。
+图片内容由Mandelbrot分形和渐变合成，既有细节也有平滑区域，压缩率接近真实照片。
+
+用法（在项目根目录下运行）:
+    python -m benchmarks.corpus --output bench_corpus --sizes 1 12
+"""
+import argparse
+import json
+import math
+import os
+
+from PIL import Image
+
+
+# 语料库索引文件名
+CORPUS_INDEX = "corpus.json"
+
+# 语料库格式版本，生成规则变化时更新，旧的语料库会被重新生成
+CORPUS_VERSION = 1
+
+# 默认生成的尺寸（百万像素）、格式和模式
+DEFAULT_SIZES = [1, 12]
+DEFAULT_FORMATS = ["jpeg", "png", "bmp", "tiff"]
+DEFAULT_MODES = ["RGB", "RGBA", "L"]
+
+# 格式名称到文件扩展名和Pillow格式名的映射
+FORMAT_INFO = {
+    "jpeg": (".jpg", "JPEG"),
+    "png": (".png", "PNG"),
+    "bmp": (".bmp", "BMP"),
+    "tiff": (".tiff", "TIFF"),
+}
+
+# 不支持的格式与模式组合，以及不能写入EXIF的格式
+UNSUPPORTED_MODES = {"jpeg": ("RGBA",)}
+NO_EXIF_FORMATS = ("bmp",)
+
+# 写入EXIF的拍摄日期
+EXIF_DATETIME = "2024:05:20 10:30:00"
+
+# 分形纹理的边长，先在小尺寸上生成再放大，避免大图生成耗时过长
+TEXTURE_SIZE = 1024
+
+
+def image_size_for_megapixels(megapixels):
+    """
+    按3:2的长宽比计算指定像素数的图片尺寸
+
+    Args:
+        megapixels: 百万像素数
+
+    Returns:
+        tuple: (宽, 高)
+    """
+    height = int(math.sqrt(megapixels * 1_000_000 / 1.5))
+    return int(height * 1.5), height
+
+
+def build_exif():
+    """
+    构造包含拍摄日期的EXIF信息
+
+    Returns:
+        bytes: 可直接传给Image.save的EXIF数据
+    """
+    exif = Image.Exif()
+    # 0x0132: DateTime，0x8769: ExifIFD，0x9003: DateTimeOriginal
+    exif[0x0132] = EXIF_DATETIME
+    exif.get_ifd(0x8769)[0x9003] = EXIF_DATETIME
+    return exif.tobytes()
+
+
+def render_image(size, mode):
+    """
+    生成确定性的合成图片
+
+    Args:
+        size: 图片尺寸 (宽, 高)
+        mode: 图片模式（RGB、RGBA、L）
+
+    Returns:
+        Image: 合成的图片
+    """
+    texture_size = (TEXTURE_SIZE, TEXTURE_SIZE * 2 // 3)
+    fractal = Image.effect_mandelbrot(texture_size, (-2.2, -1.2, 1.0, 1.2), 100)
+    red = fractal.resize(size, Image.BICUBIC)
+    green = Image.linear_gradient("L").resize(size, Image.BILINEAR)
+    blue = Image.radial_gradient("L").resize(size, Image.BILINEAR)
+    image = Image.merge("RGB", (red, green, blue))
+    if mode == "RGBA":
+        # 带渐变的alpha通道，使透明合成路径的开销可以被测量
+        alpha = Image.linear_gradient("L").rotate(90).resize(size, Image.BILINEAR)
+        image.putalpha(alpha.point(lambda value: 128 + value // 2))
+    elif mode != "RGB":
+        image = image.convert(mode)
+    return image
+
+
+def iter_corpus_specs(sizes=None, formats=None, modes=None):
+    """
+    遍历需要生成的图片组合
+
+    Yields:
+        dict: 包含name、megapixels、format、mode、exif的图片描述
+    """
+    for megapixels in sizes or DEFAULT_SIZES:
+        for image_format in formats or DEFAULT_FORMATS:
+            for mode in modes or DEFAULT_MODES:
+                if mode in UNSUPPORTED_MODES.get(image_format, ()):
+                    continue
+                for exif in (False, True):
+                    if exif and image_format in NO_EXIF_FORMATS:
+                        continue
+                    extension = FORMAT_INFO[image_format][0]
+                    name = f"{megapixels:g}mp_{mode.lower()}_{'exif' if exif else 'noexif'}{extension}"
+                    yield {
+                        "name": f"{image_format}/{name}",
+                        "megapixels": megapixels,
+                        "format": image_format,
+                        "mode": mode,
+                        "exif": exif,
+                    }
+
+
+def generate_corpus(output_dir, sizes=None, formats=None, modes=None, force=False):
+    """
+    生成测试图片集，已存在且参数相同的图片不会重复生成
+
+    Args:
+        output_dir: 输出目录
+        sizes: 图片尺寸（百万像素）列表
+        formats: 格式列表（jpeg、png、bmp、tiff）
+        modes: 图片模式列表（RGB、RGBA、L）
+        force: 是否强制重新生成所有图片
+
+    Returns:
+        list: 图片描述列表，每项包含path、size等信息
+    """
+    index_path = os.path.join(output_dir, CORPUS_INDEX)
+    existing = {}
+    if not force and os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == CORPUS_VERSION:
+            existing = {entry["name"]: entry for entry in index.get("images", [])}
+
+    images = []
+    exif_bytes = build_exif()
+    for spec in iter_corpus_specs(sizes, formats, modes):
+        path = os.path.join(output_dir, spec["name"])
+        size = image_size_for_megapixels(spec["megapixels"])
+        entry = dict(spec, path=path, width=size[0], height=size[1])
+        cached = existing.get(spec["name"])
+        if cached and os.path.exists(path) and cached.get("bytes") == os.path.getsize(path):
+            images.append(dict(entry, bytes=cached["bytes"]))
+            continue
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        image = render_image(size, spec["mode"])
+        params = {"exif": exif_bytes} if spec["exif"] else {}
+        image.save(path, FORMAT_INFO[spec["format"]][1], **params)
+        print(f"已生成: {path}")
+        images.append(dict(entry, bytes=os.path.getsize(path)))
+
+    # 合并已有索引中本次未涉及的图片，便于分多次生成
+    names = {entry["name"] for entry in images}
+    merged = images + [entry for name, entry in existing.items() if name not in names]
+    os.makedirs(output_dir, exist_ok=True)
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump({"version": CORPUS_VERSION, "images": merged}, f, ensure_ascii=False, indent=1)
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成基准测试用的合成图片集")
+    parser.add_argument("--output", default="bench_corpus", help="输出目录 (默认: bench_corpus)")
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=float,
+        default=DEFAULT_SIZES,
+        help="图片尺寸（百万像素），如 1 12 24 100 (默认: 1 12)",
+    )
+    parser.add_argument(
+        "--formats", nargs="+", choices=DEFAULT_FORMATS, default=DEFAULT_FORMATS, help="图片格式"
+    )
+    parser.add_argument(
+        "--modes", nargs="+", choices=DEFAULT_MODES, default=DEFAULT_MODES, help="图片模式"
+    )
+    parser.add_argument("--force", action="store_true", help="强制重新生成所有图片")
+    args = parser.parse_args()
+
+    images = generate_corpus(args.output, args.sizes, args.formats, args.modes, args.force)
+    print(f"图片集共 {len(images)} 张图片，位于: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+水印处理流程基准测试
+
+在合成图片集（见 benchmarks.corpus）上分别计时 get_image_exif_data、
+add_watermark_to_image（按透明度、位置、导出格式组合）以及批量导出，
+结果写入JSON文件，可用 benchmarks.compare 对比两次提交之间的差异。
+
+用法（在项目根目录下运行）:
+    python -m benchmarks.runner --output bench_results.json
+    python -m benchmarks.runner --sizes 1 --repeat 1 --output quick.json
+    python -m benchmarks.runner --sizes 1 12 100 --formats jpeg tiff --output large.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import PIL
+
+from benchmarks.corpus import (
+    DEFAULT_FORMATS,
+    DEFAULT_MODES,
+    DEFAULT_SIZES,
+    generate_corpus,
+)
+from src.watermark_tools.batch_processor import batch_export_images
+from src.watermark_tools.exif_utils import get_image_exif_data
+from src.watermark_tools.watermark_processor import add_watermark_to_image
+
+
+# 结果文件格式版本
+RESULTS_VERSION = 1
+
+# 默认的参数组合
+# None表示关闭透明度处理（跳过alpha查找表），在命令行中写作off
+DEFAULT_TRANSPARENCIES = [None, 50]
+DEFAULT_POSITIONS = ["bottom-right", "center"]
+DEFAULT_OUTPUT_FORMATS = ["source", "jpg", "png"]
+
+
+def parse_transparency(text):
+    """解析--transparencies的取值，off表示不设置透明度"""
+    if text.lower() == "off":
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的透明度: {text}（应为整数或off）")
+
+
+def time_runs(func, repeat, warmup=1):
+    """
+    多次调用并记录每次的耗时，被测函数的输出不会打印
+
+    Args:
+        func: 无参数的被测函数，返回False表示失败
+        repeat: 计时次数
+        warmup: 计时前不计时的调用次数，用于排除字体加载等一次性开销
+
+    Returns:
+        tuple: (每次耗时列表（秒）, 是否全部成功)
+    """
+    times = []
+    ok = True
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            ok = func() is not False and ok
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - start)
+            ok = result is not False and ok
+    return times, ok
+
+
+def make_result(result_id, benchmark, params, times, ok, megapixels):
+    """
+    汇总一项测试的计时结果
+
+    Args:
+        result_id: 结果标识，两次结果按此对应
+        benchmark: 测试名称
+        params: 测试参数
+        times: 每次耗时列表（秒）
+        ok: 被测函数是否全部成功
+        megapixels: 每次调用处理的总像素数（百万）
+
+    Returns:
+        dict: 结果条目
+    """
+    median = statistics.median(times)
+    return {
+        "id": result_id,
+        "benchmark": benchmark,
+        "params": params,
+        "ok": ok,
+        "times": [round(t, 6) for t in times],
+        "min": round(min(times), 6),
+        "median": round(median, 6),
+        "megapixels": megapixels,
+        "mpix_per_s": round(megapixels / median, 3) if median else None,
+    }
+
+
+def git_revision():
+    """
+    读取当前提交及工作区是否有未提交修改
+
+    Returns:
+        dict: 包含commit和dirty，不在git仓库中时commit为None
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        return {"commit": commit, "dirty": bool(status.strip())}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def collect_meta(args):
+    """
+    收集运行环境信息，便于判断两次结果是否可比
+    """
+    return dict(
+        git_revision(),
+        python=platform.python_version(),
+        pillow=PIL.__version__,
+        platform=platform.platform(),
+        machine=platform.machine(),
+        cpu_count=os.cpu_count(),
+        repeat=args.repeat,
+        warmup=args.warmup,
+        started=time.strftime("%Y-%m-%dT%H:%M:%S"),
+    )
+
+
+def bench_exif(images, args):
+    """计时每张图片的EXIF读取"""
+    results = []
+    for image in images:
+        times, ok = time_runs(
+            lambda: get_image_exif_data(image["path"]),
+            args.repeat,
+            args.warmup,
+        )
+        results.append(make_result(
+            f"exif/{image['name']}",
+            "exif",
+            {"image": image["name"]},
+            times,
+            ok,
+            image["width"] * image["height"] / 1_000_000,
+        ))
+        print(f"exif       {image['name']:<40} {results[-1]['median']:>10.4f}s")
+    return results
+
+
+def bench_watermark(images, args, work_dir):
+    """按透明度、位置和导出格式的组合计时单张图片加水印"""
+    results = []
+    for image in images:
+        source_extension = os.path.splitext(image["path"])[1][1:]
+        for output_format in args.output_formats:
+            extension = source_extension if output_format == "source" else output_format
+            output_path = os.path.join(work_dir, f"watermark.{extension}")
+            for transparency in args.transparencies:
+                for position in args.positions:
+                    times, ok = time_runs(
+                        lambda: add_watermark_to_image(
+                            image["path"],
+                            None,
+                            output_path,
+                            position=position,
+                            transparency=transparency,
+                            extension=extension,
+                        ),
+                        args.repeat,
+                        args.warmup,
+                    )
+                    transparency_label = "off" if transparency is None else transparency
+                    result_id = f"watermark/{image['name']}/{output_format}/t{transparency_label}/{position}"
+                    results.append(make_result(
+                        result_id,
+                        "watermark",
+                        {
+                            "image": image["name"],
+                            "output_format": output_format,
+                            "transparency": transparency,
+                            "position": position,
+                        },
+                        times,
+                        ok,
+                        image["width"] * image["height"] / 1_000_000,
+                    ))
+                    print(f"watermark  {result_id:<60} {results[-1]['median']:>10.4f}s")
+    return results
+
+
+def bench_batch(images, args, work_dir):
+    """按进程数计时整个图片集的批量导出"""
+    results = []
+    paths = [image["path"] for image in images]
+    megapixels = sum(image["width"] * image["height"] for image in images) / 1_000_000
+    output_dir = os.path.join(work_dir, "batch")
+    for workers in args.workers:
+        times, ok = time_runs(
+            lambda: batch_export_images(
+                paths, output_format=args.batch_format, output_dir=output_dir, workers=workers
+            ) == len(paths),
+            args.repeat,
+            args.warmup,
+        )
+        result_id = f"batch/{args.batch_format.lower()}/workers{workers}"
+        results.append(make_result(
+            result_id,
+            "batch",
+            {"images": len(paths), "output_format": args.batch_format, "workers": workers},
+            times,
+            ok,
+            megapixels,
+        ))
+        print(f"batch      {result_id:<60} {results[-1]['median']:>10.4f}s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="水印处理流程基准测试")
+    parser.add_argument("--corpus", default="bench_corpus", help="图片集目录，不存在时自动生成 (默认: bench_corpus)")
+    parser.add_argument("--output", default="bench_results.json", help="结果JSON文件 (默认: bench_results.json)")
+    parser.add_argument("--sizes", nargs="+", type=float, default=DEFAULT_SIZES, help="图片尺寸（百万像素） (默认: 1 12)")
+    parser.add_argument("--formats", nargs="+", choices=DEFAULT_FORMATS, default=DEFAULT_FORMATS, help="源图片格式")
+    parser.add_argument("--modes", nargs="+", choices=DEFAULT_MODES, default=DEFAULT_MODES, help="源图片模式")
+    parser.add_argument(
+        "--benchmarks",
+        nargs="+",
+        choices=["exif", "watermark", "batch"],
+        default=["exif", "watermark", "batch"],
+        help="要运行的测试项",
+    )
+    parser.add_argument(
+        "--transparencies",
+        nargs="+",
+        type=parse_transparency,
+        default=DEFAULT_TRANSPARENCIES,
+        help="水印透明度，off表示关闭透明度处理 (默认: off 50)",
+    )
+    parser.add_argument(
+        "--positions",
+        nargs="+",
+        choices=["top-left", "center", "bottom-right"],
+        default=DEFAULT_POSITIONS,
+        help="水印位置 (默认: bottom-right center)",
+    )
+    parser.add_argument(
+        "--output-formats",
+        nargs="+",
+        choices=["source", "jpg", "png", "bmp", "tiff"],
+        default=DEFAULT_OUTPUT_FORMATS,
+        help="导出格式，source表示与源图片相同 (默认: source jpg png)",
+    )
+    parser.add_argument("--batch-format", default="JPEG", help="批量导出格式 (默认: JPEG)")
+    parser.add_argument(
+        "--workers", nargs="+", type=int, default=[1, os.cpu_count() or 1], help="批量导出的进程数"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="每项计时次数 (默认: 3)")
+    parser.add_argument("--warmup", type=int, default=1, help="每项计时前的预热次数 (默认: 1)")
+    args = parser.parse_args()
+    args.workers = sorted(set(args.workers))
+
+    images = generate_corpus(args.corpus, args.sizes, args.formats, args.modes)
+    meta = collect_meta(args)
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="watermark_bench_")
+    try:
+        if "exif" in args.benchmarks:
+            results.extend(bench_exif(images, args))
+        if "watermark" in args.benchmarks:
+            results.extend(bench_watermark(images, args, work_dir))
+        if "batch" in args.benchmarks:
+            results.extend(bench_batch(images, args, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(
+            {"version": RESULTS_VERSION, "meta": meta, "results": results},
+            f,
+            ensure_ascii=False,
+            indent=1,
+        )
+    failed = [result["id"] for result in results if not result["ok"]]
+    print(f"共 {len(results)} 项结果，已写入: {args.output}")
+    if failed:
+        print(f"以下 {len(failed)} 项存在失败的调用: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,16 +5,24 @@
 """
 import os
 import sys
+import time
 import argparse
 from src.watermark_tools import (
-    get_image_exif_data,
-    get_photo_datetime,
     add_watermark_to_image,
     check_file_exists,
     check_supported_format,
     check_watermark_suffix,
     process_directory,
+    set_font_path,
+    compile_watermark_plan,
+    get_stamp_cache_stats,
+    get_encoder_options,
+    ProfileReport,
+    enable_profiling,
+    start_file_profile,
+    finish_file_profile,
 )
+from src.watermark_tools.config import PIPELINE_STAGE_WORKERS, ENCODER_PRESETS, DEFAULT_PROFILE_REPORT
 
 
 def show_usage():
@@ -29,6 +37,25 @@ def show_usage():
     print("  -p position    设置水印位置: top-left(默认), center, bottom-right")
     print("  -s font_size   设置水印字体大小(默认: 24)")
     print("  -c color       设置水印颜色，如 red 或 #FF0000(默认: 白色)")
+    print("  -f font_file   设置水印字体文件(默认: 自动查找系统中文字体)")
+    print("  -j jobs        批量处理时的并行进程数，0表示使用全部CPU(默认: 1)")
+    print("  -r             递归处理子目录，输出目录中保持原有子目录结构")
+    print("  --include pat  只处理匹配通配符的文件，可多次指定，如 --include '*.jpg'")
+    print("  --exclude pat  跳过匹配通配符的文件或目录，可多次指定")
+    print("  --follow-symlinks  递归时进入指向目录的符号链接")
+    print("  --incremental  增量处理，跳过源文件和水印设置均未变化的文件")
+    print("  --hash         增量处理时比较文件内容摘要，修改时间变化但内容相同的文件也跳过")
+    print("  --max-memory MB  并行处理时的内存预算，大图片会自动串行处理(默认: 不限制)")
+    print("  --pipeline     在单个进程中以读取、解码、水印、编码、写入多阶段流水线处理")
+    print("  --stage-workers read=4,decode=2  设置流水线各阶段的线程数")
+    print("  --preset name  导出编码预设: fast, balanced(默认), smallest；fast只加快PNG编码")
+    print("  --quality N    JPEG质量 1-95")
+    print("  --subsampling  JPEG色度抽样: 4:4:4, 4:2:2, 4:2:0")
+    print("  --progressive  生成渐进式JPEG")
+    print("  --optimize     优化JPEG哈夫曼表，文件更小但编码更慢")
+    print("  --png-compress-level N  PNG压缩级别 0-9，越小越快")
+    print("  --profile      输出各阶段耗时统计并写入报告")
+    print(f"  --profile-report file  性能报告文件，扩展名为.csv时输出CSV(默认: {DEFAULT_PROFILE_REPORT})")
     print("\n功能说明:")
     print("  - 如果提供单个图片文件路径，将为该图片添加水印并保存")
     print("  - 如果提供目录路径，将批量处理目录中的所有支持的图片文件")
@@ -36,7 +63,29 @@ def show_usage():
     print("  - 处理后的图片将保存到与原目录同名的'原目录名_watermark'文件夹中")
 
 
-def process_single_file(input_file, position=None, font_size=None, color=None):
+def parse_stage_workers(value):
+    """
+    解析流水线各阶段线程数参数，格式如 read=4,decode=2
+
+    Args:
+        value: 命令行参数值
+
+    Returns:
+        dict: 阶段名称到线程数的映射
+    """
+    stage_workers = {}
+    for item in value.split(","):
+        name, _, count = item.partition("=")
+        name = name.strip()
+        if name not in PIPELINE_STAGE_WORKERS or not count.strip().isdigit() or int(count) < 1:
+            raise argparse.ArgumentTypeError(
+                f"无效的阶段线程数 '{item}'，阶段可选: {', '.join(PIPELINE_STAGE_WORKERS)}"
+            )
+        stage_workers[name] = int(count)
+    return stage_workers
+
+
+def process_single_file(input_file, position=None, font_size=None, color=None, plan=None, encoder_options=None):
     """
     处理单个图片文件
 
@@ -45,6 +94,8 @@ def process_single_file(input_file, position=None, font_size=None, color=None):
         position: 水印位置
         font_size: 字体大小
         color: 水印颜色
+        plan: 预先编译的水印方案，提供时忽略position、font_size和color
+        encoder_options: 编码参数，为None时使用Pillow默认值
     """
     # 检查文件是否存在
     if not check_file_exists(input_file):
@@ -58,18 +109,6 @@ def process_single_file(input_file, position=None, font_size=None, color=None):
     if not check_supported_format(input_file):
         return False
 
-    # 获取EXIF数据
-    exif_data = get_image_exif_data(input_file)
-
-    # 获取拍摄日期
-    photo_date = get_photo_datetime(exif_data)
-
-    if not photo_date:
-        print(f"警告: 无法从图片 '{input_file}' 中提取拍摄日期，使用当前日期作为替代")
-        from datetime import datetime
-
-        photo_date = datetime.now().strftime("%Y-%m-%d")
-
     # 准备输出文件路径 - 在输入文件所在目录下创建同名_watermark子目录
     file_dir = os.path.dirname(input_file)
     dir_name = os.path.basename(file_dir) if file_dir else os.path.basename(os.getcwd())
@@ -89,9 +128,11 @@ def process_single_file(input_file, position=None, font_size=None, color=None):
     output_file_name = f"{base_name}_watermark{extension}"
     output_file = os.path.join(output_dir, output_file_name)
 
-    # 添加水印，传递自定义参数
+    # 添加水印，使用编译好的水印方案，拍摄日期从同一次打开的文件中读取
+    if plan is None:
+        plan = compile_watermark_plan(None, position, font_size, color)
     return add_watermark_to_image(
-        input_file, photo_date, output_file, position, font_size, color
+        input_file, None, output_file, plan=plan, encoder_options=encoder_options
     )
 
 
@@ -113,9 +154,114 @@ def main():
         "-s", "--font-size", type=int, default=24, help="字体大小 (默认: 24)"
     )
     parser.add_argument("-c", "--color", default="white", help="水印颜色 (默认: white)")
+    parser.add_argument(
+        "-f", "--font", default=None, help="水印字体文件路径 (默认: 自动查找系统中文字体)"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="批量处理时的并行进程数，0表示使用全部CPU (默认: 1)",
+    )
+    parser.add_argument(
+        "-r", "--recursive", action="store_true", help="递归处理子目录"
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=None,
+        help="只处理文件名或相对路径匹配该通配符的文件，可多次指定",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=None,
+        help="跳过文件名或相对路径匹配该通配符的文件和目录，可多次指定",
+    )
+    parser.add_argument(
+        "--follow-symlinks", action="store_true", help="递归时进入指向目录的符号链接（指向文件的链接总会被处理）"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="增量处理，根据输出目录中的处理清单跳过未变化的文件",
+    )
+    parser.add_argument(
+        "--hash",
+        action="store_true",
+        help="增量处理时比较源文件内容摘要（需同时指定 --incremental）",
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=int,
+        default=None,
+        help="并行处理时同时处理的图片预计占用内存上限（MB），超出时等待其他图片处理完成 (默认: 不限制)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="在单个进程中以读取、解码、水印、编码、写入多阶段流水线处理，适合网络存储",
+    )
+    parser.add_argument(
+        "--stage-workers",
+        type=parse_stage_workers,
+        default=None,
+        help="流水线各阶段的线程数，如 read=8,write=8 (默认: read=4,decode=2,watermark=1,encode=2,write=4)",
+    )
+    parser.add_argument(
+        "--preset",
+        choices=list(ENCODER_PRESETS),
+        default=None,
+        help="导出编码预设: fast压缩PNG最快（JPEG与balanced相同），balanced与默认一致，smallest文件最小 (默认: balanced)",
+    )
+    parser.add_argument(
+        "--quality",
+        type=int,
+        choices=range(1, 96),
+        default=None,
+        metavar="1-95",
+        help="JPEG质量 (默认: 75)",
+    )
+    parser.add_argument(
+        "--subsampling",
+        choices=["4:4:4", "4:2:2", "4:2:0"],
+        default=None,
+        help="JPEG色度抽样 (默认: 4:2:0)",
+    )
+    parser.add_argument(
+        "--progressive", action="store_true", default=None, help="生成渐进式JPEG"
+    )
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        default=None,
+        help="优化JPEG哈夫曼表，文件更小但编码更慢",
+    )
+    parser.add_argument(
+        "--png-compress-level",
+        type=int,
+        choices=range(10),
+        default=None,
+        metavar="0-9",
+        help="PNG的zlib压缩级别，越小越快 (默认: 6)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="记录每个文件解码、EXIF、渲染、合成、编码、写入等阶段的耗时，输出百分位统计并写入报告",
+    )
+    parser.add_argument(
+        "--profile-report",
+        default=DEFAULT_PROFILE_REPORT,
+        metavar="PATH",
+        help=f"--profile的报告文件，扩展名为.csv时输出CSV (默认: {DEFAULT_PROFILE_REPORT})",
+    )
 
     # 解析命令行参数
     args = parser.parse_args()
+    if args.hash and not args.incremental:
+        parser.error("--hash 需要同时指定 --incremental")
 
     # 获取输入路径和自定义参数
     input_path = args.input_path
@@ -123,23 +269,81 @@ def main():
     font_size = args.font_size
     color = args.color
 
+    # 指定字体文件
+    if args.font and not set_font_path(args.font):
+        return
+
     # 检查输入路径是否存在
     if not os.path.exists(input_path):
         print(f"错误: 路径 '{input_path}' 不存在")
         return
 
+    # 在编译水印方案前启用性能分析，字体加载计入一次性开销
+    report = None
+    if args.profile:
+        enable_profiling()
+        report = ProfileReport()
+
+    # 只编译一次水印方案，单文件与目录处理共用
+    plan = compile_watermark_plan(None, position, font_size, color)
+
+    # 只有指定了编码预设或参数时才覆盖Pillow的默认编码参数
+    encoder_overrides = {
+        "jpeg_quality": args.quality,
+        "jpeg_subsampling": args.subsampling,
+        "jpeg_progressive": args.progressive,
+        "jpeg_optimize": args.optimize,
+        "png_compress_level": args.png_compress_level,
+    }
+    encoder_options = None
+    if args.preset or any(value is not None for value in encoder_overrides.values()):
+        encoder_options = get_encoder_options(args.preset, **encoder_overrides)
+
     # 判断是文件还是目录
     if os.path.isfile(input_path):
         # 处理单个文件
-        process_single_file(input_path, position, font_size, color)
+        start = time.perf_counter()
+        timings = start_file_profile()
+        success = process_single_file(input_path, plan=plan, encoder_options=encoder_options)
+        finish_file_profile()
+        if report is not None:
+            timings["total"] = time.perf_counter() - start
+            report.add(input_path, timings, success)
     else:
         # 处理目录中的所有文件
-        success_count = process_directory(input_path, position, font_size, color)
+        success_count = process_directory(
+            input_path,
+            plan=plan,
+            workers=args.jobs,
+            recursive=args.recursive,
+            include=args.include,
+            exclude=args.exclude,
+            follow_symlinks=args.follow_symlinks,
+            incremental=args.incremental,
+            use_hash=args.hash,
+            max_memory_mb=args.max_memory,
+            pipeline=args.pipeline,
+            stage_workers=args.stage_workers,
+            encoder_options=encoder_options,
+            result_callback=report.add_result if report is not None else None,
+        )
         print(f"批量处理完成，成功处理了 {success_count} 个文件")
+        if args.jobs == 1 or args.pipeline:
+            # 并行处理时缓存位于各工作进程中，只在单进程处理时输出统计
+            stats = get_stamp_cache_stats()
+            print(f"水印图块缓存: 命中 {stats['hits']} 次，未命中 {stats['misses']} 次")
+
+    if report is not None:
+        report.print_summary()
+        report.write(args.profile_report)
 
 
 if __name__ == "__main__":
     import sys
+    import multiprocessing
+
+    # 打包为可执行文件后，并行批处理的工作进程需要此调用
+    multiprocessing.freeze_support()
 
     if len(sys.argv) == 1:
         # 无参数时启动GUI
@@ -1,9 +1,21 @@
+from collections import namedtuple
 from PyQt5.QtWidgets import QLabel
-from PyQt5.QtCore import Qt, QPoint, pyqtSignal
+from PyQt5.QtGui import QPainter
+from PyQt5.QtCore import Qt, QPoint, QTimer, pyqtSignal
+from src.watermark_tools.config import DRAG_OVERLAY_FRAME_MS
+
+
+# 拖拽叠加层：未添加水印的预览底图、按显示比例渲染的水印图块及其偏移、
+# 按显示比例缩放的水印方案、水印文本，以及图片在标签中的显示区域 (x, y, width, height)
+DragOverlay = namedtuple('DragOverlay', ['base', 'stamp', 'offset', 'plan', 'text', 'display_rect'])
+
 
 class DraggableWatermarkLabel(QLabel):
     """
     支持拖拽功能的水印预览标签类
+
+    拖拽时不重新生成预览，而是用QPainter在缓存的预览底图上按鼠标位置绘制缓存的水印图块，
+    按固定帧率刷新；松开鼠标后只生成一次精确预览，精确预览显示之前保持叠加层。
     """
     # 定义信号，当水印位置改变时发射
     watermark_position_changed = pyqtSignal(tuple)  # (rel_x, rel_y)
@@ -19,7 +31,15 @@ class DraggableWatermarkLabel(QLabel):
         self.setAcceptDrops(True)
         # 用于存储当前水印文本
         self.current_text = ""
-    
+        # 拖拽叠加层（见MainWindow.create_drag_overlay）及水印图块当前的绘制位置
+        self.overlay = None
+        self.overlay_stamp_position = None
+        self._overlay_dirty = False
+        # 按固定帧率刷新叠加层，鼠标移动事件再多也不会超过该帧率
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setInterval(DRAG_OVERLAY_FRAME_MS)
+        self._frame_timer.timeout.connect(self._refresh_overlay)
+
     def mousePressEvent(self, event):
         """
         鼠标按下事件，开始拖拽
@@ -28,8 +48,14 @@ class DraggableWatermarkLabel(QLabel):
             self.dragging = True
             self.drag_start_position = event.pos()
             self.setCursor(Qt.ClosedHandCursor)
+            # 准备叠加层，预览尚未生成时仍可拖拽，只是松开前看不到水印位置
+            if hasattr(self.parent, 'create_drag_overlay'):
+                self.overlay = self.parent.create_drag_overlay()
+                self.overlay_stamp_position = None
+                if self.overlay is not None:
+                    self._frame_timer.start()
         super().mousePressEvent(event)
-    
+
     def mouseMoveEvent(self, event):
         """
         鼠标移动事件，处理拖拽
@@ -37,10 +63,7 @@ class DraggableWatermarkLabel(QLabel):
         if not self.dragging:
             super().mouseMoveEvent(event)
             return
-        
-        # 计算拖拽偏移量
-        delta = event.pos() - self.drag_start_position
-        
+
         # 如果标签有图片（水印预览）且父窗口是MainWindow
         if hasattr(self.parent, 'watermark_position') and hasattr(self.parent, 'image_paths') and self.parent.image_paths:
             # 确保当前有选中的图片
@@ -48,62 +71,113 @@ class DraggableWatermarkLabel(QLabel):
             if selected < 0 or selected >= len(self.parent.image_paths):
                 super().mouseMoveEvent(event)
                 return
-            
-            # 计算实际图片上的相对位置
-            from PIL import Image
+
+            # 计算实际图片上的相对位置，图片尺寸按图片缓存，不在每次移动时打开文件
             img_path = self.parent.image_paths[selected]
             try:
-                image = Image.open(img_path)
-                img_width, img_height = image.size
-                
-                # 获取标签的尺寸和图片在标签中的缩放比例
-                label_width = self.width()
-                label_height = self.height()
-                
-                # 计算图片在标签中的实际显示区域（考虑保持比例）
-                scale = min(label_width / img_width, label_height / img_height)
-                display_width = int(img_width * scale)
-                display_height = int(img_height * scale)
-                display_x = (label_width - display_width) // 2
-                display_y = (label_height - display_height) // 2
-                
+                if self.overlay is not None:
+                    display_x, display_y, display_width, display_height = self.overlay.display_rect
+                else:
+                    img_width, img_height = self.parent.get_image_size(img_path)
+
+                    # 获取标签的尺寸和图片在标签中的缩放比例
+                    label_width = self.width()
+                    label_height = self.height()
+
+                    # 计算图片在标签中的实际显示区域（考虑保持比例）
+                    scale = min(label_width / img_width, label_height / img_height)
+                    display_width = int(img_width * scale)
+                    display_height = int(img_height * scale)
+                    display_x = (label_width - display_width) // 2
+                    display_y = (label_height - display_height) // 2
+
                 # 检查鼠标是否在图片显示区域内
                 mouse_x, mouse_y = event.pos().x(), event.pos().y()
-                if (display_x <= mouse_x < display_x + display_width and 
+                if (display_x <= mouse_x < display_x + display_width and
                     display_y <= mouse_y < display_y + display_height):
-                    
+
                     # 计算在原始图片上的相对位置
                     rel_x = (mouse_x - display_x) / display_width
                     rel_y = (mouse_y - display_y) / display_height
-                    
-                    # 设置精确的坐标位置（转换为元组类型）
+
+                    # 设置精确的坐标位置（转换为元组类型），松开鼠标时再通知侧边栏并生成精确预览
                     self.parent.watermark_position = (rel_x, rel_y)
-                    # 发射位置改变信号
-                    self.watermark_position_changed.emit((rel_x, rel_y))
-                    
-                    # 实时更新预览（可选，为了性能可以不更新）
-                    # self.parent.show_preview()
+                    if self.overlay is not None:
+                        self.move_overlay_stamp((rel_x, rel_y))
             except Exception as e:
                 print(f"计算水印位置时出错: {e}")
-        
+
         super().mouseMoveEvent(event)
-    
+
     def mouseReleaseEvent(self, event):
         """
         鼠标释放事件，结束拖拽
         """
         if event.button() == Qt.LeftButton and self.dragging:
             self.dragging = False
+            self._frame_timer.stop()
+            self._refresh_overlay()
             self.setCursor(Qt.OpenHandCursor)
-            # 鼠标释放后更新预览
+            position = getattr(self.parent, 'watermark_position', None)
+            if isinstance(position, tuple):
+                # 发射位置改变信号
+                self.watermark_position_changed.emit(position)
+            # 鼠标释放后更新预览，精确预览显示前仍显示叠加层
             if hasattr(self.parent, 'show_preview'):
                 self.parent.show_preview()
         super().mouseReleaseEvent(event)
-        
+
+    def move_overlay_stamp(self, position):
+        """
+        按水印位置计算叠加层中水印图块的绘制位置，在下一帧刷新
+
+        Args:
+            position: 水印的相对坐标 (rel_x, rel_y)
+        """
+        display_x, display_y, display_width, display_height = self.overlay.display_rect
+        origin = self.overlay.plan.calculate_position(
+            display_width, display_height, self.overlay.text, position
+        )
+        self.overlay_stamp_position = QPoint(
+            display_x + origin[0] + self.overlay.offset[0],
+            display_y + origin[1] + self.overlay.offset[1],
+        )
+        self._overlay_dirty = True
+
+    def clear_overlay(self):
+        """移除叠加层，恢复显示精确预览"""
+        if self.overlay is not None and not self.dragging:
+            self.overlay = None
+            self.overlay_stamp_position = None
+            self.update()
+
+    def _refresh_overlay(self):
+        """叠加层位置有变化时重绘"""
+        if self._overlay_dirty:
+            self._overlay_dirty = False
+            self.update()
+
+    def paintEvent(self, event):
+        """有叠加层时绘制预览底图和水印图块，否则按QLabel默认方式绘制"""
+        if self.overlay is None or self.overlay_stamp_position is None:
+            super().paintEvent(event)
+            return
+        painter = QPainter(self)
+        display_x, display_y, _, _ = self.overlay.display_rect
+        painter.drawPixmap(display_x, display_y, self.overlay.base)
+        painter.drawPixmap(self.overlay_stamp_position, self.overlay.stamp)
+        painter.end()
+
+    def setPixmap(self, pixmap):
+        """显示新的预览时移除叠加层"""
+        super().setPixmap(pixmap)
+        self.clear_overlay()
+
     def setText(self, text):
         """重写setText方法，保存当前水印文本"""
         self.current_text = text
         super().setText(text)
+        self.clear_overlay()
         # 如果文本为空，清空样式表
         if not text:
-            self.setStyleSheet("border: 1px solid #ccc;")
\ No newline at end of file
+            self.setStyleSheet("border: 1px solid #ccc;")
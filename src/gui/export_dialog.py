@@ -0,0 +1,156 @@
+import os
+from PyQt5.QtWidgets import (
+    QDialog,
+    QHBoxLayout,
+    QLabel,
+    QMessageBox,
+    QProgressBar,
+    QPushButton,
+    QVBoxLayout,
+)
+from PyQt5.QtCore import Qt
+
+
+# 导出汇总中直接列出的失败文件数，其余只在详细信息中显示
+SUMMARY_MAX_FAILURES = 10
+
+
+def format_duration(seconds):
+    """将秒数格式化为 mm:ss 或 h:mm:ss"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+class ExportProgressDialog(QDialog):
+    """
+    导出进度对话框
+
+    显示已完成数量、当前文件、处理速度和预计剩余时间，提供暂停/继续和取消按钮。
+    对话框本身不执行导出，只连接到ExportWorker的信号。
+    """
+
+    def __init__(self, worker, parent=None):
+        """
+        Args:
+            worker: 正在执行的导出任务（ExportWorker）
+            parent: 父窗口
+        """
+        super().__init__(parent)
+        self.worker = worker
+        self.setWindowTitle("正在导出")
+        self.setMinimumWidth(420)
+        # 只能通过取消按钮结束导出
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowCloseButtonHint)
+
+        layout = QVBoxLayout(self)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, max(1, len(worker.settings.image_paths)))
+        self.progress_bar.setValue(0)
+        layout.addWidget(self.progress_bar)
+        self.status_label = QLabel("正在准备导出...")
+        layout.addWidget(self.status_label)
+        self.file_label = QLabel("")
+        self.file_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(self.file_label)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        self.pause_btn = QPushButton("暂停")
+        self.pause_btn.clicked.connect(self.toggle_pause)
+        button_layout.addWidget(self.pause_btn)
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.clicked.connect(self.cancel_export)
+        button_layout.addWidget(self.cancel_btn)
+        layout.addLayout(button_layout)
+
+        worker.progress.connect(self.on_progress)
+
+    def on_progress(self, progress):
+        """
+        更新进度
+
+        Args:
+            progress: 导出进度（ExportProgress）
+        """
+        self.progress_bar.setValue(progress.done)
+        self.file_label.setText(os.path.basename(progress.result.input_path))
+        if self.worker.is_cancelled():
+            return
+        if self.worker.is_paused():
+            self.status_label.setText(f"已完成 {progress.done}/{progress.total}，已暂停")
+            return
+        text = f"已完成 {progress.done}/{progress.total}"
+        if progress.elapsed > 0:
+            rate = progress.done / progress.elapsed
+            megabytes = progress.bytes_written / (1024 * 1024) / progress.elapsed
+            remaining = (progress.total - progress.done) / rate if rate > 0 else 0
+            text += f"，{rate:.1f} 张/秒（{megabytes:.1f} MB/秒），预计剩余 {format_duration(remaining)}"
+        self.status_label.setText(text)
+
+    def toggle_pause(self):
+        """暂停或继续导出"""
+        if self.worker.is_paused():
+            self.worker.resume()
+            self.pause_btn.setText("暂停")
+            self.status_label.setText("正在继续导出...")
+        else:
+            self.worker.pause()
+            self.pause_btn.setText("继续")
+            self.status_label.setText("正在暂停，等待已开始的图片处理完成...")
+
+    def cancel_export(self):
+        """取消导出，等待正在处理的图片完成后结束"""
+        self.worker.cancel()
+        self.pause_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(False)
+        self.status_label.setText("正在取消，等待已开始的图片处理完成...")
+
+    def reject(self):
+        # Esc键等同于取消导出，对话框在导出结束后由调用方关闭
+        if self.worker.isRunning():
+            self.cancel_export()
+        else:
+            super().reject()
+
+
+def show_export_summary(parent, summary):
+    """
+    显示导出汇总，列出失败的文件
+
+    Args:
+        parent: 父窗口
+        summary: 导出汇总（ExportSummary）
+    """
+    if summary.error:
+        QMessageBox.warning(parent, "失败", f"导出失败：{summary.error}")
+        return
+    text = f"成功导出 {summary.succeeded} 张图片，用时 {format_duration(summary.elapsed)}"
+    if summary.cancelled:
+        text = f"导出已取消。{text}，共 {summary.total} 张"
+    if summary.output_dir:
+        text += f"\n输出目录：{summary.output_dir}"
+    if not summary.failures:
+        if summary.succeeded or summary.cancelled:
+            QMessageBox.information(parent, "完成" if summary.cancelled else "成功", text)
+        else:
+            QMessageBox.warning(parent, "失败", "导出失败，请检查设置！")
+        return
+
+    lines = [
+        f"{os.path.basename(path)}：{error}"
+        for path, error in summary.failures[:SUMMARY_MAX_FAILURES]
+    ]
+    if len(summary.failures) > SUMMARY_MAX_FAILURES:
+        lines.append(f"……另有 {len(summary.failures) - SUMMARY_MAX_FAILURES} 张，见详细信息")
+    box = QMessageBox(
+        QMessageBox.Warning,
+        "导出完成",
+        f"{text}\n{len(summary.failures)} 张图片导出失败：\n" + "\n".join(lines),
+        parent=parent,
+    )
+    box.setDetailedText("\n".join(f"{path}：{error}" for path, error in summary.failures))
+    box.exec_()
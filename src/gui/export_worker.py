@@ -0,0 +1,199 @@
+import time
+import threading
+import multiprocessing
+from collections import namedtuple
+from PyQt5.QtCore import QThread, pyqtSignal
+from src.watermark_tools.config import GUI_EXPORT_CHUNK_SIZE, GUI_EXPORT_MAX_MEMORY_MB, GUI_EXPORT_WORKERS
+
+
+# 导出开始时的设置快照，导出过程中修改界面设置不影响本次导出
+ExportSettings = namedtuple(
+    'ExportSettings',
+    [
+        'image_paths',
+        'output_format',
+        'output_dir',
+        'prefix',
+        'suffix',
+        'naming_rule',
+        'plan',
+        'encoder_options',
+        'workers',
+        'max_memory_mb',
+    ],
+)
+
+# 一次导出的进度：已完成数、总数、刚完成文件的结果（ExportResult）、
+# 不含暂停时间的已用秒数，以及累计写入字节数
+ExportProgress = namedtuple(
+    'ExportProgress', ['done', 'total', 'result', 'elapsed', 'bytes_written']
+)
+
+# 导出结束后的汇总：failures 为 (输入路径, 错误信息) 列表
+ExportSummary = namedtuple(
+    'ExportSummary',
+    ['total', 'succeeded', 'failures', 'cancelled', 'elapsed', 'output_dir', 'error'],
+)
+
+
+def snapshot_export_settings(
+    image_paths,
+    output_format,
+    output_dir,
+    prefix,
+    suffix,
+    naming_rule,
+    plan,
+    encoder_options=None,
+    workers=GUI_EXPORT_WORKERS,
+    max_memory_mb=GUI_EXPORT_MAX_MEMORY_MB,
+):
+    """
+    复制当前的导出设置，得到导出过程中不会变化的快照
+
+    水印方案在设置变化时整体重新编译而不会被修改，可以直接共享；
+    图片列表和编码参数则复制一份。
+
+    Returns:
+        ExportSettings: 设置快照
+    """
+    return ExportSettings(
+        tuple(image_paths),
+        output_format,
+        output_dir,
+        prefix,
+        suffix,
+        naming_rule,
+        plan,
+        dict(encoder_options) if encoder_options else None,
+        workers,
+        max_memory_mb,
+    )
+
+
+class ExportWorker(QThread):
+    """
+    在后台线程中按设置快照批量导出图片
+
+    并行导出时由工作进程处理文件，本线程只负责分发任务并逐个汇报结果。
+    暂停时不再分发新任务，已分发的任务完成后停下；
+    取消时不再分发新任务，等待正在处理的任务结束后汇报汇总。
+    """
+
+    # ExportProgress，每完成一个文件发射一次
+    progress = pyqtSignal(object)
+    # ExportSummary，导出结束（完成、取消或出错）时发射一次
+    export_finished = pyqtSignal(object)
+
+    def __init__(self, settings, parent=None):
+        """
+        Args:
+            settings: 导出设置快照（ExportSettings）
+            parent: 父对象
+        """
+        super().__init__(parent)
+        self.settings = settings
+        self._cancelled = False
+        # 未暂停时处于set状态
+        self._resume = threading.Event()
+        self._resume.set()
+        self._time_lock = threading.Lock()
+        self._started_at = None
+        self._paused_at = None
+        self._paused_total = 0.0
+
+    def pause(self):
+        """暂停导出，已分发的任务仍会完成"""
+        with self._time_lock:
+            if self._paused_at is None:
+                self._paused_at = time.perf_counter()
+        self._resume.clear()
+
+    def resume(self):
+        """继续导出"""
+        with self._time_lock:
+            if self._paused_at is not None:
+                self._paused_total += time.perf_counter() - self._paused_at
+                self._paused_at = None
+        self._resume.set()
+
+    def cancel(self):
+        """取消导出，暂停中的导出也会立即结束等待"""
+        self._cancelled = True
+        self._resume.set()
+
+    def is_paused(self):
+        return not self._resume.is_set()
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def elapsed(self):
+        """不含暂停时间的已用秒数"""
+        with self._time_lock:
+            if self._started_at is None:
+                return 0.0
+            now = self._paused_at if self._paused_at is not None else time.perf_counter()
+            return now - self._started_at - self._paused_total
+
+    def run(self):
+        from src.watermark_tools.batch_processor import iter_export_images
+
+        settings = self.settings
+        total = len(settings.image_paths)
+        output_dirs = []
+        failures = []
+        succeeded = 0
+        done = 0
+        bytes_written = 0
+        error = None
+        with self._time_lock:
+            self._started_at = time.perf_counter()
+        results = iter_export_images(
+            settings.image_paths,
+            output_format=settings.output_format,
+            output_dir=settings.output_dir,
+            prefix=settings.prefix,
+            suffix=settings.suffix,
+            naming_rule=settings.naming_rule,
+            plan=settings.plan,
+            workers=settings.workers,
+            ordered=False,
+            max_memory_mb=settings.max_memory_mb,
+            encoder_options=settings.encoder_options,
+            output_dir_callback=output_dirs.append,
+            # GUI进程中已有其他线程在运行，工作进程使用spawn启动
+            mp_context=multiprocessing.get_context('spawn'),
+            # 逐个分发文件，暂停和取消时在途的文件不超过进程数的两倍
+            chunk_size=GUI_EXPORT_CHUNK_SIZE,
+        )
+        try:
+            for result in results:
+                done += 1
+                bytes_written += result.bytes_written
+                if result.success:
+                    succeeded += 1
+                else:
+                    failures.append((result.input_path, result.error or "未知错误"))
+                self.progress.emit(ExportProgress(done, total, result, self.elapsed(), bytes_written))
+                # 暂停时停止从结果迭代器取值，迭代器随之停止分发新任务
+                self._resume.wait()
+                if self._cancelled:
+                    break
+        except Exception as e:
+            error = str(e)
+            print(f"导出图片时出错: {e}")
+        finally:
+            # 提前结束时关闭迭代器，取消尚未开始的任务并等待工作进程退出
+            results.close()
+        self.export_finished.emit(
+            ExportSummary(
+                total,
+                succeeded,
+                failures,
+                self._cancelled and done < total,
+                self.elapsed(),
+                output_dirs[0] if output_dirs else None,
+                error,
+            )
+        )
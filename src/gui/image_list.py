@@ -0,0 +1,279 @@
+import os
+from PyQt5.QtWidgets import QListView
+from PyQt5.QtGui import QColor, QIcon, QImage, QPixmap
+from PyQt5.QtCore import (
+    QAbstractListModel,
+    QModelIndex,
+    QPoint,
+    QRunnable,
+    QSize,
+    QThreadPool,
+    QTimer,
+    Qt,
+    pyqtSignal,
+)
+from .image_utils import pil_to_qimage
+from src.watermark_tools.config import THUMBNAIL_PREFETCH_ROWS, THUMBNAIL_SIZE, THUMBNAIL_WORKER_THREADS
+
+
+SUPPORTED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tiff")
+
+
+class ImageListModel(QAbstractListModel):
+    """
+    图片列表模型
+
+    添加图片时只插入行并显示占位图标，缩略图由视图按可见范围请求，
+    在后台线程池中降低分辨率解码，完成后再刷新对应的行。
+    路径到行号的索引使去重和查找均为O(1)。
+    """
+
+    # (代数, 图片路径, QImage)，QImage为None表示任务开始时该行已不可见而被跳过，
+    # 为空QImage表示解码失败
+    thumbnail_loaded = pyqtSignal(int, str, object)
+
+    def __init__(self, parent=None, thumbnail_size=THUMBNAIL_SIZE, max_threads=THUMBNAIL_WORKER_THREADS, cache=None):
+        """
+        Args:
+            parent: 父对象
+            thumbnail_size: 缩略图边长（像素）
+            max_threads: 后台解码缩略图的线程数
+            cache: 磁盘缩略图缓存（ThumbnailCache），为None时每次都解码原图
+        """
+        super().__init__(parent)
+        self.thumbnail_size = thumbnail_size
+        self.cache = cache
+        self._paths = []
+        self._index = {}
+        self._thumbnails = {}
+        # 已提交但尚未完成的缩略图任务，以及当前可见（含预加载）范围内的图片
+        self._queued = set()
+        self._wanted = set()
+        self.generation = 0
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, max_threads))
+        placeholder = QPixmap(thumbnail_size, thumbnail_size)
+        placeholder.fill(QColor("#e0e0e0"))
+        self.placeholder_icon = QIcon(placeholder)
+        self.thumbnail_loaded.connect(self._on_thumbnail_loaded)
+
+    @property
+    def paths(self):
+        """按行排列的图片路径列表（只读）"""
+        return self._paths
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._paths):
+            return None
+        path = self._paths[index.row()]
+        if role == Qt.DisplayRole:
+            return os.path.basename(path)
+        if role == Qt.DecorationRole:
+            return self._thumbnails.get(path, self.placeholder_icon)
+        if role in (Qt.ToolTipRole, Qt.UserRole):
+            return path
+        return None
+
+    def add_paths(self, paths):
+        """
+        追加图片，已在列表中的路径会被跳过
+
+        Args:
+            paths: 图片路径列表
+
+        Returns:
+            int: 实际添加的图片数量
+        """
+        start = len(self._paths)
+        new_paths = []
+        for path in paths:
+            if path not in self._index:
+                self._index[path] = start + len(new_paths)
+                new_paths.append(path)
+        if new_paths:
+            self.beginInsertRows(QModelIndex(), start, start + len(new_paths) - 1)
+            self._paths.extend(new_paths)
+            self.endInsertRows()
+        return len(new_paths)
+
+    def clear(self):
+        """清空列表，作废所有尚未完成的缩略图任务"""
+        self.generation += 1
+        self.pool.clear()
+        self.beginResetModel()
+        self._paths = []
+        self._index = {}
+        self._thumbnails = {}
+        self._queued = set()
+        self._wanted = set()
+        self.endResetModel()
+
+    def row_of(self, path):
+        """返回图片所在的行号，不在列表中时返回-1"""
+        return self._index.get(path, -1)
+
+    def is_wanted(self, path):
+        """判断图片是否仍在可见（含预加载）范围内"""
+        return path in self._wanted
+
+    def request_thumbnails(self, first, last):
+        """
+        请求生成指定行范围内的缩略图，此前请求但已不可见的行在任务开始时跳过
+
+        Args:
+            first: 起始行号
+            last: 结束行号（包含）
+        """
+        paths = self._paths[first:last + 1]
+        self._wanted = set(paths)
+        for path in paths:
+            if path not in self._thumbnails and path not in self._queued:
+                self._queued.add(path)
+                self.pool.start(_ThumbnailTask(self, self.generation, path, self.thumbnail_size))
+
+    def shutdown(self):
+        """作废未开始的任务并等待正在执行的任务结束"""
+        self.generation += 1
+        self.pool.clear()
+        self.pool.waitForDone()
+
+    def _on_thumbnail_loaded(self, generation, path, qimage):
+        """缩略图任务结束（在GUI线程中执行），更新对应行的图标"""
+        if generation != self.generation:
+            return
+        self._queued.discard(path)
+        if qimage is None:
+            # 任务被跳过后该行又变为可见时重新提交
+            if path in self._wanted:
+                self._queued.add(path)
+                self.pool.start(_ThumbnailTask(self, generation, path, self.thumbnail_size))
+            return
+        row = self._index.get(path)
+        if row is None:
+            return
+        # 解码失败时保留占位图标，不再重试
+        self._thumbnails[path] = self.placeholder_icon if qimage.isNull() else QIcon(QPixmap.fromImage(qimage))
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class _ThumbnailTask(QRunnable):
+    """在线程池中执行的单个缩略图解码"""
+
+    def __init__(self, model, generation, image_path, size):
+        super().__init__()
+        self.model = model
+        self.generation = generation
+        self.image_path = image_path
+        self.size = size
+
+    def run(self):
+        from src.watermark_tools.thumbnail_cache import load_thumbnail
+
+        if self.generation != self.model.generation or not self.model.is_wanted(self.image_path):
+            self.model.thumbnail_loaded.emit(self.generation, self.image_path, None)
+            return
+        try:
+            # 优先读取磁盘缓存，未命中时降低分辨率解码原图
+            thumbnail = load_thumbnail(self.image_path, self.size, self.model.cache)
+            # QPixmap只能在GUI线程中创建，这里只转换为QImage
+            qimage = pil_to_qimage(thumbnail)
+        except Exception as e:
+            print(f"生成缩略图时出错: {e}")
+            qimage = QImage()
+        self.model.thumbnail_loaded.emit(self.generation, self.image_path, qimage)
+
+
+class DraggableListView(QListView):
+    """
+    支持拖入图片文件的图片列表视图
+
+    滚动、改变尺寸或插入行后，只为可见行及其前后THUMBNAIL_PREFETCH_ROWS行请求缩略图。
+    """
+
+    # 选中项变化时发射，与QListWidget的同名信号一致
+    itemSelectionChanged = pyqtSignal()
+
+    def __init__(self, main_window, prefetch_rows=THUMBNAIL_PREFETCH_ROWS):
+        super().__init__()
+        self.main_window = main_window
+        self.prefetch_rows = prefetch_rows
+        self.setAcceptDrops(True)
+        self.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        # 行高一致，视图不必逐行计算尺寸
+        self.setUniformItemSizes(True)
+        # 同一事件循环内的多次滚动和插入合并为一次缩略图请求
+        self._thumbnail_timer = QTimer(self)
+        self._thumbnail_timer.setSingleShot(True)
+        self._thumbnail_timer.setInterval(0)
+        self._thumbnail_timer.timeout.connect(self.request_visible_thumbnails)
+        self.verticalScrollBar().valueChanged.connect(self.schedule_thumbnails)
+
+    def setModel(self, model):
+        super().setModel(model)
+        model.rowsInserted.connect(self.schedule_thumbnails)
+        model.modelReset.connect(self.schedule_thumbnails)
+
+    def schedule_thumbnails(self, *args):
+        """在下一次事件循环中请求可见行的缩略图"""
+        self._thumbnail_timer.start()
+
+    def request_visible_thumbnails(self):
+        """为可见行及预加载范围内的行请求缩略图"""
+        model = self.model()
+        count = model.rowCount() if model is not None else 0
+        if not count:
+            return
+        first = self.indexAt(QPoint(1, 1)).row()
+        if first < 0:
+            first = 0
+        last = self.indexAt(QPoint(1, self.viewport().height() - 2)).row()
+        if last < 0:
+            # 视图底部没有行，说明最后一行已可见
+            last = count - 1
+        model.request_thumbnails(max(0, first - self.prefetch_rows), min(count - 1, last + self.prefetch_rows))
+
+    def currentRow(self):
+        """当前选中的行号，没有选中时返回-1"""
+        return self.currentIndex().row()
+
+    def setCurrentRow(self, row):
+        self.setCurrentIndex(self.model().index(row, 0))
+
+    def selectionChanged(self, selected, deselected):
+        super().selectionChanged(selected, deselected)
+        self.itemSelectionChanged.emit()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.schedule_thumbnails()
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            event.ignore()
+
+    def dragMoveEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            event.ignore()
+
+    def dropEvent(self, event):
+        if event.mimeData().hasUrls():
+            files = []
+            for url in event.mimeData().urls():
+                path = url.toLocalFile()
+                if os.path.isfile(path) and path.lower().endswith(SUPPORTED_EXTENSIONS):
+                    files.append(path)
+            if files:
+                self.main_window.add_images(files)
+            event.acceptProposedAction()
+        else:
+            event.ignore()
@@ -0,0 +1,63 @@
+from PyQt5.QtGui import QImage, QPixmap
+
+
+# PIL图片模式到QImage格式的映射，每像素字节数与PIL的raw数据一致
+QIMAGE_FORMATS = {
+    'RGB': (QImage.Format_RGB888, 3),
+    'RGBA': (QImage.Format_RGBA8888, 4),
+    'L': (QImage.Format_Grayscale8, 1),
+}
+
+
+def _qimage_view(image):
+    """
+    将PIL图片的像素导出为一份紧凑的字节串，并在其上直接构造QImage
+
+    Pillow内部以每像素4字节存储RGB图片且不公开缓冲区，因此tobytes()这一次复制不可避免；
+    QImage本身不再复制，它引用data中的像素，只能在data存活期间使用。
+
+    Returns:
+        tuple: (QImage, 像素数据)
+    """
+    if image.mode not in QIMAGE_FORMATS:
+        image = image.convert('RGBA')
+    qformat, pixel_bytes = QIMAGE_FORMATS[image.mode]
+    data = image.tobytes()
+    qimage = QImage(data, image.width, image.height, image.width * pixel_bytes, qformat)
+    return qimage, data
+
+
+def pil_to_qimage(image):
+    """
+    将PIL图片转换为QImage
+
+    Args:
+        image: PIL图片对象
+
+    Returns:
+        QImage: 转换后的图片（数据已复制，不依赖原图）
+
+    像素共复制两次：tobytes()一次，QImage.copy()一次。后一次不能省略，
+    因为QImage会经信号跨线程传递，届时Python端的字节串可能已被回收。
+    """
+    qimage, _ = _qimage_view(image)
+    return qimage.copy()
+
+
+def pil_to_qpixmap(image):
+    """
+    将PIL图片转换为QPixmap（只能在GUI线程中调用）
+
+    像素共复制两次：tobytes()一次，生成QPixmap时一次；中间的QImage不再单独复制。
+
+    Args:
+        image: PIL图片对象
+
+    Returns:
+        QPixmap: 转换后的图片
+    """
+    qimage, data = _qimage_view(image)
+    pixmap = QPixmap.fromImage(qimage)
+    # QPixmap已持有像素副本，此后才可以释放data
+    del qimage, data
+    return pixmap
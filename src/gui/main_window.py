@@ -10,57 +10,28 @@ from PyQt5.QtWidgets import (
     QFileDialog,
     QLabel,
     QSizePolicy,
-    QListWidget,
-    QListWidgetItem,
     QPushButton,
     QDesktopWidget
 )
 # 导入可拖拽标签类
-from .draggable_label import DraggableWatermarkLabel
-from PyQt5.QtGui import QPixmap, QIcon
-from PyQt5.QtCore import QSize, Qt
+from .draggable_label import DraggableWatermarkLabel, DragOverlay
+from .image_list import ImageListModel, DraggableListView, SUPPORTED_EXTENSIONS
+from .image_utils import pil_to_qpixmap
+from .export_dialog import ExportProgressDialog, show_export_summary
+from .export_worker import ExportWorker, snapshot_export_settings
+from .preview_cache import PreviewCache
+from .preview_worker import PreviewRenderer, PreviewResult
+from PyQt5.QtCore import Qt
 
 # 引入拆分后的sidebar类
 from src.gui.sidebars.main_sidebar import MainSidebar
 from src.gui.sidebars.export_settings_sidebar import ExportSettingsSidebar
 from src.gui.sidebars.watermark_settings_sidebar import WatermarkSettingsSidebar
+from src.watermark_tools.manifest import settings_fingerprint
+from src.watermark_tools.thumbnail_cache import ThumbnailCache
 from src.watermark_tools.config import DEFAULT_EXPORT_FORMAT, DEFAULT_WATERMARK_COLOR, DEFAULT_WATERMARK_TEXT, DEFAULT_WATERMARK_TRANSPARENCY, DEFAULT_FONT_SIZE
 
 
-# 保证DraggableListWidget可用
-class DraggableListWidget(QListWidget):
-    def __init__(self, main_window):
-        super().__init__()
-        self.main_window = main_window
-        self.setAcceptDrops(True)
-
-    def dragEnterEvent(self, event):
-        if event.mimeData().hasUrls():
-            event.acceptProposedAction()
-        else:
-            event.ignore()
-
-    def dragMoveEvent(self, event):
-        if event.mimeData().hasUrls():
-            event.acceptProposedAction()
-        else:
-            event.ignore()
-
-    def dropEvent(self, event):
-        if event.mimeData().hasUrls():
-            files = []
-            exts = (".jpg", ".jpeg", ".png", ".bmp", ".tiff")
-            for url in event.mimeData().urls():
-                path = url.toLocalFile()
-                if os.path.isfile(path) and path.lower().endswith(exts):
-                    files.append(path)
-            if files:
-                self.main_window.add_images(files)
-            event.acceptProposedAction()
-        else:
-            event.ignore()
-
-
 class MainWindow(QMainWindow):
     def _move_export_btn(self):
         # 将导出按钮定位到主窗口右下角，保持20px边距
@@ -78,35 +49,50 @@ class MainWindow(QMainWindow):
             self, "选择图片", "", "图片文件 (*.jpg *.jpeg *.png *.bmp *.tiff)"
         )
         if files:
-            self.list_widget.clear()
-            self.image_paths = []
+            self.image_model.clear()
             self.add_images(files)
 
     def select_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "选择文件夹", "")
         if folder:
-            exts = (".jpg", ".jpeg", ".png", ".bmp", ".tiff")
             files = [
                 os.path.join(folder, f)
                 for f in os.listdir(folder)
-                if f.lower().endswith(exts)
+                if f.lower().endswith(SUPPORTED_EXTENSIONS)
             ]
-            self.list_widget.clear()
-            self.image_paths = []
+            self.image_model.clear()
             self.add_images(files)
 
+    @property
+    def image_paths(self):
+        """列表中的图片路径，按行排列"""
+        return self.image_model.paths
+
     def __init__(self):
-        self.image_paths = []
         self.export_path = ""  # 确保初始化
         self.export_naming_rule = 0
         self.export_format = DEFAULT_EXPORT_FORMAT
+        # 导出编码参数，为None时使用Pillow默认值
+        self.encoder_options = None
         # 初始化水印设置
         self.watermark_text = DEFAULT_WATERMARK_TEXT
         self.watermark_transparency = DEFAULT_WATERMARK_TRANSPARENCY
         self.watermark_color = DEFAULT_WATERMARK_COLOR
         self.watermark_font_size = DEFAULT_FONT_SIZE  # 从配置中导入的默认字号
         self.watermark_position = "center"  # 默认中央位置
+        # 编译后的水印方案及其对应的设置，设置变化时重新编译
+        self._watermark_plan = None
+        self._watermark_plan_key = None
+        # 按图片路径缓存的原图尺寸，以及最近一次预览的结果（拖拽叠加层使用其代理图片）
+        self._image_sizes = {}
+        self._preview_source = None
+        # 最近一次请求的预览缓存键 (图片路径, 设置指纹, 预览区域尺寸)
+        self._preview_key = None
+        # 正在执行的后台导出及其进度对话框
+        self.export_worker = None
+        self.export_dialog = None
         super().__init__()
+        self.image_model = ImageListModel(self, cache=ThumbnailCache())
         self.setWindowTitle("图片水印工具")
         
         # 获取屏幕尺寸并设置窗口大小为屏幕的70%×70%
@@ -132,8 +118,8 @@ class MainWindow(QMainWindow):
         # 左侧 sidebar
         self.sidebar_main = MainSidebar(self)
         self.sidebar_main.list_widget.setParent(None)
-        self.list_widget = DraggableListWidget(self)
-        self.list_widget.setIconSize(QSize(128, 128))
+        self.list_widget = DraggableListView(self)
+        self.list_widget.setModel(self.image_model)
         self.list_widget.setMinimumHeight(400)
         self.sidebar_main.layout().insertWidget(3, self.list_widget)
         self.sidebar_main.list_widget = self.list_widget
@@ -224,6 +210,9 @@ class MainWindow(QMainWindow):
         self.sidebar_export_settings.export_settings_changed.connect(
             self.handle_export_settings_change
         )
+        self.sidebar_export_settings.encoder_settings_changed.connect(
+            self.handle_encoder_settings_change
+        )
         # 连接水印设置信号
         self.sidebar_watermark_settings.watermark_settings_changed.connect(
             self.handle_watermark_settings_change
@@ -234,6 +223,16 @@ class MainWindow(QMainWindow):
             self.handle_watermark_position_change
         )
 
+        # 预览在后台线程中生成，只绘制最新一次请求的结果
+        self.preview_cache = PreviewCache()
+        self.preview_renderer = PreviewRenderer(self, cache=self.preview_cache)
+        self.preview_renderer.preview_ready.connect(self.on_preview_ready)
+        self.preview_renderer.preview_failed.connect(self.on_preview_failed)
+
+    def handle_encoder_settings_change(self, encoder_options):
+        self.encoder_options = encoder_options
+        print(f"编码设置更新: {encoder_options}")
+
     def handle_export_settings_change(self, format, prefix, suffix, export_path):
         # 检查导出路径是否与已上传图片的目录冲突
         if export_path:
@@ -382,6 +381,22 @@ class MainWindow(QMainWindow):
                         if hasattr(sidebar, 'custom_position_widget'):
                             sidebar.custom_position_widget.setVisible(False)
         
+    def get_watermark_plan(self):
+        """获取与当前水印设置对应的水印方案，设置未变化时复用已编译的方案"""
+        from src.watermark_tools.watermark_plan import compile_watermark_plan
+
+        key = (
+            self.watermark_text,
+            self.watermark_position,
+            self.watermark_font_size,
+            self.watermark_color,
+            self.watermark_transparency,
+        )
+        if self._watermark_plan is None or key != self._watermark_plan_key:
+            self._watermark_plan = compile_watermark_plan(*key)
+            self._watermark_plan_key = key
+        return self._watermark_plan
+
     def on_templates_changed(self):
         """模板变更时的回调"""
         # 这里可以添加额外的处理逻辑，比如更新主窗口的状态等
@@ -445,8 +460,11 @@ class MainWindow(QMainWindow):
 
     def export_images(self):
         from PyQt5.QtWidgets import QMessageBox
-        from src.watermark_tools.batch_processor import batch_export_images
 
+        if self.export_worker is not None:
+            # 上一次导出尚未结束
+            self.export_dialog.raise_()
+            return
         if not self.image_paths:
             QMessageBox.warning(self, "警告", "未选择任何图片！")
             return
@@ -461,39 +479,41 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "警告", "导出路径不能与图片所在文件夹相同！")
             return
 
-        count = batch_export_images(
+        try:
+            plan = self.get_watermark_plan()
+        except Exception as e:
+            QMessageBox.warning(self, "失败", f"水印设置有误：{e}")
+            return
+        # 按当前设置的快照在后台导出，导出期间界面保持响应，修改设置不影响本次导出
+        settings = snapshot_export_settings(
             self.image_paths,
-            output_format=self.export_format,
-            output_dir=self.export_path,
-            prefix=self.export_prefix,
-            suffix=self.export_suffix,
-            naming_rule=self.export_naming_rule,
-            watermark_text=self.watermark_text,
-            transparency=self.watermark_transparency,
-            color=self.watermark_color,
-            position=self.watermark_position,
-            font_size=self.watermark_font_size
+            self.export_format,
+            self.export_path,
+            self.export_prefix,
+            self.export_suffix,
+            self.export_naming_rule,
+            plan,
+            self.encoder_options,
         )
-        if count:
-            QMessageBox.information(self, "成功", f"成功导出 {count} 张图片！")
-        else:
-            QMessageBox.warning(self, "失败", "导出失败，请检查设置！")
+        self.export_worker = ExportWorker(settings, self)
+        self.export_worker.export_finished.connect(self.on_export_finished)
+        self.export_dialog = ExportProgressDialog(self.export_worker, self)
+        self.export_btn.setEnabled(False)
+        self.export_dialog.show()
+        self.export_worker.start()
+
+    def on_export_finished(self, summary):
+        """后台导出结束，关闭进度对话框并显示汇总"""
+        self.export_worker.wait()
+        self.export_worker = None
+        self.export_dialog.accept()
+        self.export_dialog = None
+        self.export_btn.setEnabled(True)
+        show_export_summary(self, summary)
 
     def add_images(self, files):
-        # 不清除已选图片，追加
-        for file in files:
-            if file not in self.image_paths:
-                self.image_paths.append(file)
-                item = QListWidgetItem(os.path.basename(file))
-                pixmap = QPixmap(file)
-                if not pixmap.isNull():
-                    icon = QIcon(
-                        pixmap.scaled(
-                            QSize(128, 128), Qt.KeepAspectRatio, Qt.SmoothTransformation
-                        )
-                    )
-                    item.setIcon(icon)
-                self.list_widget.addItem(item)
+        # 不清除已选图片，追加；先显示占位图标，缩略图由列表按可见范围在后台生成
+        self.image_model.add_paths(files)
         self.check_export_path_conflict()
 
     def add_images_dialog(self):
@@ -506,97 +526,123 @@ class MainWindow(QMainWindow):
     def show_preview(self):
         selected = self.list_widget.currentRow()
         if selected < 0 or selected >= len(self.image_paths):
+            # 作废仍在生成的预览，避免其结果覆盖空白预览区
+            self.preview_renderer.cancel()
             self.preview_label_watermarked.clear()
             self.preview_label_watermarked.setText("水印预览区")
             return
         img_path = self.image_paths[selected]
 
-        # 水印预览，文件存储到tmp文件夹
+        # 使用固定的预览区域尺寸
+        w = self.preview_label_watermarked.width()
+        h = self.preview_label_watermarked.height()
         try:
-            from src.watermark_tools.watermark_processor import add_watermark_to_image
-
-            # watermark_text = "预览水印"
-            tmp_dir = os.path.join(os.getcwd(), "tmp")
-            if not os.path.exists(tmp_dir):
-                os.makedirs(tmp_dir)
-            import uuid
-
-            tmp_path = os.path.join(tmp_dir, f"preview_{uuid.uuid4().hex}.png")
-            # 传递所有水印设置参数，包括透明度和导出格式
-            success = add_watermark_to_image(
-                img_path, 
-                self.watermark_text, 
-                tmp_path,
-                position=self.watermark_position,
-                font_size=self.watermark_font_size,
-                color=self.watermark_color,
-                transparency=self.watermark_transparency,
-                extension=self.export_format.lower()
-            )
-            if success:
-                pixmap_wm = QPixmap(tmp_path)
-                if not pixmap_wm.isNull():
-                    # 使用固定的预览区域尺寸进行图片缩放
-                    w = self.preview_label_watermarked.width()
-                    h = self.preview_label_watermarked.height()
-                    
-                    # 确保图片按比例缩放并完全适应预览区域
-                    scaled_wm = pixmap_wm.scaled(
-                        w, h, Qt.KeepAspectRatio, Qt.SmoothTransformation
-                    )
-                    self.preview_label_watermarked.setPixmap(scaled_wm)
-                else:
-                    self.preview_label_watermarked.setText("无法加载水印图片")
-            else:
-                self.preview_label_watermarked.setText("水印生成失败")
+            plan = self.get_watermark_plan()
         except Exception as e:
+            self.preview_renderer.cancel()
             self.preview_label_watermarked.setText(f"水印预览出错: {e}")
+            return
+        # 看过的图片和设置直接显示缓存的预览，源文件被修改后重新生成
+        try:
+            source_key = self.preview_cache.source_key(img_path)
+        except OSError:
+            # 无法读取文件信息时不使用缓存，由后台生成预览时报告错误
+            source_key = None
+        self._preview_key = None
+        pixmap = None
+        if source_key is not None:
+            self._preview_key = (source_key, settings_fingerprint(plan, self.export_format), (w, h))
+            pixmap = self.preview_cache.get_pixmap(self._preview_key)
+        if pixmap is not None:
+            self.preview_renderer.cancel()
+            cached = self.preview_cache.get_proxy(source_key, (w, h))
+            self._preview_source = PreviewResult(img_path, None, *cached) if cached is not None else None
+            self.preview_label_watermarked.setPixmap(pixmap)
+            return
+        # 在后台线程中解码并添加水印，生成期间界面保持响应，仍显示上一次的预览
+        self.preview_renderer.request(img_path, (w, h), plan, self.export_format.lower())
+
+    def on_preview_ready(self, generation, preview):
+        """后台预览生成完成，过期请求的结果直接丢弃"""
+        if not self.preview_renderer.is_current(generation):
+            return
+        self._image_sizes[preview.image_path] = preview.original_size
+        self._preview_source = preview
+        pixmap_wm = pil_to_qpixmap(preview.image)
+        # 确保图片按比例缩放并完全适应预览区域
+        scaled_wm = pixmap_wm.scaled(
+            self.preview_label_watermarked.width(),
+            self.preview_label_watermarked.height(),
+            Qt.KeepAspectRatio,
+            Qt.SmoothTransformation,
+        )
+        if self._preview_key is not None:
+            self.preview_cache.put_pixmap(self._preview_key, scaled_wm)
+        self.preview_label_watermarked.setPixmap(scaled_wm)
+
+    def get_image_size(self, img_path):
+        """
+        获取原图尺寸，每张图片只读取一次头信息
+
+        Returns:
+            tuple: (width, height)
+        """
+        size = self._image_sizes.get(img_path)
+        if size is None:
+            from src.watermark_tools.image_io import open_image_header
+
+            with open_image_header(img_path) as image:
+                size = image.size
+            self._image_sizes[img_path] = size
+        return size
+
+    def create_drag_overlay(self):
+        """
+        生成拖拽水印时的叠加层，底图取自当前预览的代理图片，水印图块按显示比例渲染
+
+        Returns:
+            DragOverlay: 叠加层，当前图片的预览尚未生成时返回None
+        """
+        selected = self.list_widget.currentRow()
+        preview = self._preview_source
+        if (
+            preview is None
+            or selected < 0
+            or selected >= len(self.image_paths)
+            or preview.image_path != self.image_paths[selected]
+        ):
+            return None
+        from src.watermark_tools.watermark_processor import convert_for_export
+
+        try:
+            w = self.preview_label_watermarked.width()
+            h = self.preview_label_watermarked.height()
+            proxy = convert_for_export(preview.proxy, self.export_format.lower())
+            base = pil_to_qpixmap(proxy).scaled(w, h, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            display_rect = ((w - base.width()) // 2, (h - base.height()) // 2, base.width(), base.height())
+            plan = self.get_watermark_plan().scaled(base.width() / preview.original_size[0])
+            text = plan.resolve_text()
+            if not text:
+                return None
+            tile, offset = plan.render_tile(text)
+            return DragOverlay(base, pil_to_qpixmap(tile), offset, plan, text, display_rect)
+        except Exception as e:
+            print(f"生成拖拽叠加层时出错: {e}")
+            return None
+
+    def on_preview_failed(self, generation, message):
+        """后台预览生成失败，过期请求的错误直接丢弃"""
+        if self.preview_renderer.is_current(generation):
+            self.preview_label_watermarked.setText(message)
 
     def closeEvent(self, event):
-        # 清理临时文件夹，但不再保存设置
-        clear_tmp_folder()
+        # 等待后台预览结束，不再保存设置
+        self.preview_renderer.cancel()
+        self.preview_renderer.wait()
+        self.image_model.shutdown()
+        # 关闭窗口时取消正在执行的导出，等待已开始的图片处理完成
+        if self.export_worker is not None:
+            self.export_worker.cancel()
+            self.export_worker.wait()
         super().closeEvent(event)
 
-
-# 拖拽支持的自定义QListWidget
-class DraggableListWidget(QListWidget):
-    def __init__(self, main_window):
-        super().__init__()
-        self.main_window = main_window
-        self.setAcceptDrops(True)
-
-    def dragEnterEvent(self, event):
-        if event.mimeData().hasUrls():
-            event.acceptProposedAction()
-        else:
-            event.ignore()
-
-    def dragMoveEvent(self, event):
-        if event.mimeData().hasUrls():
-            event.acceptProposedAction()
-        else:
-            event.ignore()
-
-    def dropEvent(self, event):
-        if event.mimeData().hasUrls():
-            files = []
-            exts = (".jpg", ".jpeg", ".png", ".bmp", ".tiff")
-            for url in event.mimeData().urls():
-                path = url.toLocalFile()
-                if os.path.isfile(path) and path.lower().endswith(exts):
-                    files.append(path)
-            if files:
-                self.main_window.add_images(files)
-            event.acceptProposedAction()
-        else:
-            event.ignore()
-
-
-def clear_tmp_folder():
-    tmp_dir = os.path.join(os.getcwd(), "tmp")
-    if os.path.exists(tmp_dir):
-        import shutil
-        try:
-            shutil.rmtree(tmp_dir)
-        except Exception:
-            pass
@@ -0,0 +1,102 @@
+import os
+
+from src.watermark_tools.config import PREVIEW_CACHE_SIZE_MB, PREVIEW_PROXY_CACHE_RATIO
+from src.watermark_tools.memory_cache import SizedLRUCache
+
+
+def _proxy_nbytes(entry):
+    """估算 (代理图片, 原图尺寸) 占用的字节数"""
+    proxy, _ = entry
+    return proxy.width * proxy.height * len(proxy.getbands())
+
+
+def _pixmap_nbytes(pixmap):
+    """估算QPixmap占用的字节数"""
+    return pixmap.width() * pixmap.height() * max(1, pixmap.depth() // 8)
+
+
+class PreviewCache:
+    """
+    两级预览缓存，总内存不超过给定上限
+
+    第一级按 (源文件键, 预览区域尺寸) 缓存降低分辨率解码的代理图片，
+    在后台线程中读写，切换水印设置时无需重新解码；
+    第二级按 (源文件键, 设置指纹, 预览区域尺寸) 缓存生成好的预览QPixmap，
+    只在GUI线程中读写，回到看过的图片或恢复之前的设置时直接显示。
+    源文件键包含修改时间和大小，源文件在磁盘上被修改后旧条目不再命中。
+    """
+
+    def __init__(self, size_mb=PREVIEW_CACHE_SIZE_MB, proxy_ratio=PREVIEW_PROXY_CACHE_RATIO):
+        """
+        Args:
+            size_mb: 两级缓存的总内存上限（MB）
+            proxy_ratio: 其中分配给代理图片的比例
+        """
+        max_bytes = int(size_mb * 1024 * 1024)
+        proxy_bytes = int(max_bytes * proxy_ratio)
+        self.proxies = SizedLRUCache(proxy_bytes, _proxy_nbytes)
+        self.pixmaps = SizedLRUCache(max_bytes - proxy_bytes, _pixmap_nbytes)
+
+    @staticmethod
+    def source_key(image_path):
+        """
+        计算源文件键，与ThumbnailCache.key一样包含纳秒级修改时间和文件大小
+
+        Args:
+            image_path: 原图路径
+
+        Returns:
+            tuple: (图片路径, 修改时间, 文件大小)
+
+        Raises:
+            OSError: 无法读取文件信息
+        """
+        stat = os.stat(image_path)
+        return (image_path, stat.st_mtime_ns, stat.st_size)
+
+    def get_proxy(self, source_key, target_size):
+        """
+        获取缓存的代理图片
+
+        Args:
+            source_key: 源文件键（见source_key）
+            target_size: 预览区域尺寸
+
+        Returns:
+            tuple: (代理图片, 原图尺寸)，未命中时返回None
+        """
+        return self.proxies.get((source_key, tuple(target_size)))
+
+    def put_proxy(self, source_key, target_size, proxy, original_size):
+        """缓存代理图片，调用方此后不应修改该图片"""
+        self.proxies.put((source_key, tuple(target_size)), (proxy, original_size))
+
+    def get_pixmap(self, key):
+        """
+        获取缓存的预览
+
+        Args:
+            key: (源文件键, 设置指纹, 预览区域尺寸)
+
+        Returns:
+            QPixmap: 缩放到预览区域的预览，未命中时返回None
+        """
+        return self.pixmaps.get(key)
+
+    def put_pixmap(self, key, pixmap):
+        """缓存缩放到预览区域的预览"""
+        self.pixmaps.put(key, pixmap)
+
+    def clear(self):
+        """清空两级缓存"""
+        self.proxies.clear()
+        self.pixmaps.clear()
+
+    def stats(self):
+        """
+        获取两级缓存的统计信息
+
+        Returns:
+            dict: {'proxies': {...}, 'pixmaps': {...}}，各级统计见SizedLRUCache.stats
+        """
+        return {'proxies': self.proxies.stats(), 'pixmaps': self.pixmaps.stats()}
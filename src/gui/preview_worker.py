@@ -0,0 +1,114 @@
+from collections import namedtuple
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from src.watermark_tools.config import PREVIEW_WORKER_THREADS
+
+
+# 一次预览的结果：添加水印后的预览图片、未添加水印的代理图片（拖拽叠加层的底图）和原图尺寸
+PreviewResult = namedtuple('PreviewResult', ['image_path', 'image', 'proxy', 'original_size'])
+
+
+class PreviewRenderer(QObject):
+    """
+    在后台线程池中生成水印预览
+
+    每次请求都会递增代数（generation），结果信号携带请求时的代数，
+    接收方只绘制与当前代数一致的结果；尚未开始的过期请求直接从线程池中移除，
+    正在执行的过期请求在解码和添加水印之后检查代数并提前结束。
+    """
+
+    # (代数, PreviewResult)，图片在GUI线程中转换为QPixmap
+    preview_ready = pyqtSignal(int, object)
+    # (代数, 错误信息)
+    preview_failed = pyqtSignal(int, str)
+
+    def __init__(self, parent=None, max_threads=PREVIEW_WORKER_THREADS, cache=None):
+        """
+        Args:
+            parent: 父对象
+            max_threads: 后台生成预览的线程数
+            cache: 预览缓存（PreviewCache），用于复用解码后的代理图片，为None时每次都解码
+        """
+        super().__init__(parent)
+        self.cache = cache
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, max_threads))
+        self.generation = 0
+
+    def request(self, image_path, target_size, plan, extension=None):
+        """
+        请求生成一张预览，之前尚未完成的请求全部作废
+
+        Args:
+            image_path: 图片文件路径
+            target_size: 预览区域尺寸 (width, height)
+            plan: 原图尺寸下的水印方案，在后台线程中按代理图片缩放
+            extension: 导出格式扩展名，预览按该格式的编码规则生成
+
+        Returns:
+            int: 本次请求的代数
+        """
+        self.cancel()
+        self.pool.start(_PreviewTask(self, self.generation, image_path, target_size, plan, extension))
+        return self.generation
+
+    def cancel(self):
+        """作废所有未完成的请求"""
+        self.generation += 1
+        self.pool.clear()
+
+    def is_current(self, generation):
+        """判断请求是否仍是最新的请求"""
+        return generation == self.generation
+
+    def wait(self, msecs=-1):
+        """
+        等待正在执行的请求结束
+
+        Args:
+            msecs: 最长等待毫秒数，-1表示一直等待
+
+        Returns:
+            bool: 是否所有请求均已结束
+        """
+        return self.pool.waitForDone(msecs)
+
+
+class _PreviewTask(QRunnable):
+    """在线程池中执行的单次预览生成"""
+
+    def __init__(self, renderer, generation, image_path, target_size, plan, extension):
+        super().__init__()
+        self.renderer = renderer
+        self.generation = generation
+        self.image_path = image_path
+        self.target_size = target_size
+        self.plan = plan
+        self.extension = extension
+
+    def run(self):
+        from src.watermark_tools.image_io import load_image_for_size
+        from src.watermark_tools.watermark_processor import watermark_preview
+
+        try:
+            # 按预览区域尺寸降低分辨率解码，已解码过的代理图片直接复用
+            # 源文件键在解码前读取，解码期间文件被修改时不会以新键缓存旧内容
+            cache = self.renderer.cache
+            source_key = cache.source_key(self.image_path) if cache is not None else None
+            cached = cache.get_proxy(source_key, self.target_size) if cache is not None else None
+            if cached is None:
+                proxy, original_size = load_image_for_size(self.image_path, self.target_size)
+                if cache is not None:
+                    cache.put_proxy(source_key, self.target_size, proxy, original_size)
+            else:
+                proxy, original_size = cached
+            if not self.renderer.is_current(self.generation):
+                return
+            # 在内存中添加水印并按导出格式转换模式，不经过编码和临时文件
+            result = watermark_preview(proxy, original_size, self.plan, self.extension)
+            if not self.renderer.is_current(self.generation):
+                return
+            self.renderer.preview_ready.emit(
+                self.generation, PreviewResult(self.image_path, result, proxy, original_size)
+            )
+        except Exception as e:
+            self.renderer.preview_failed.emit(self.generation, f"水印预览出错: {e}")
@@ -6,13 +6,22 @@ from PyQt5.QtWidgets import (
     QComboBox,
     QLineEdit,
     QHBoxLayout,
+    QSpinBox,
+    QCheckBox,
 )
 from PyQt5.QtCore import pyqtSignal
+from src.watermark_tools.config import ENCODER_PRESETS, DEFAULT_ENCODER_PRESET
+from src.watermark_tools.watermark_processor import get_encoder_options
 
 
 class ExportSettingsSidebar(QFrame):
     # 修正信号定义，包含 4 个参数
     export_settings_changed = pyqtSignal(str, str, str, str)
+    # 编码参数字典，见 get_encoder_options
+    encoder_settings_changed = pyqtSignal(dict)
+
+    # 编码预设的显示名称
+    PRESET_LABELS = {"fast": "快速", "balanced": "均衡", "smallest": "最小体积"}
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -26,6 +35,27 @@ class ExportSettingsSidebar(QFrame):
         self.format_combo = QComboBox()
         self.format_combo.addItems(["JPEG", "PNG"])
         layout.addWidget(self.format_combo)
+        layout.addWidget(QLabel("编码预设："))
+        self.preset_combo = QComboBox()
+        for name in ENCODER_PRESETS:
+            self.preset_combo.addItem(self.PRESET_LABELS.get(name, name), name)
+        self.preset_combo.setCurrentIndex(list(ENCODER_PRESETS).index(DEFAULT_ENCODER_PRESET))
+        layout.addWidget(self.preset_combo)
+        quality_layout = QHBoxLayout()
+        quality_layout.addWidget(QLabel("JPEG质量："))
+        self.quality_spin = QSpinBox()
+        self.quality_spin.setRange(1, 95)
+        quality_layout.addWidget(self.quality_spin)
+        layout.addLayout(quality_layout)
+        self.progressive_check = QCheckBox("渐进式JPEG")
+        layout.addWidget(self.progressive_check)
+        png_layout = QHBoxLayout()
+        png_layout.addWidget(QLabel("PNG压缩级别："))
+        self.png_level_spin = QSpinBox()
+        self.png_level_spin.setRange(0, 9)
+        png_layout.addWidget(self.png_level_spin)
+        layout.addLayout(png_layout)
+        self.apply_encoder_preset(DEFAULT_ENCODER_PRESET)
         layout.addWidget(QLabel("命名规则："))
         self.naming_rule_combo = QComboBox()
         self.naming_rule_combo.addItems(["保留原文件名", "添加前缀", "添加后缀"])
@@ -52,6 +82,10 @@ class ExportSettingsSidebar(QFrame):
         self.naming_prefix_edit.textChanged.connect(self.on_prefix_changed)
         self.naming_suffix_edit.textChanged.connect(self.on_suffix_changed)
         self.btn_select_export_path.clicked.connect(self.on_select_export_path)
+        self.preset_combo.currentIndexChanged.connect(self.on_preset_changed)
+        self.quality_spin.valueChanged.connect(self.emit_encoder_settings)
+        self.progressive_check.toggled.connect(self.emit_encoder_settings)
+        self.png_level_spin.valueChanged.connect(self.emit_encoder_settings)
 
         # 初始化时隐藏前缀和后缀输入框
         self.naming_prefix_edit.setVisible(False)
@@ -62,6 +96,35 @@ class ExportSettingsSidebar(QFrame):
         self.emit_export_settings()
         print(f"导出格式已更改为: {format}")
 
+    def apply_encoder_preset(self, preset):
+        """将预设的编码参数显示到各控件中，不触发设置变更信号"""
+        options = ENCODER_PRESETS[preset]
+        for widget in (self.quality_spin, self.progressive_check, self.png_level_spin):
+            widget.blockSignals(True)
+        self.quality_spin.setValue(options["jpeg_quality"])
+        self.progressive_check.setChecked(options["jpeg_progressive"])
+        self.png_level_spin.setValue(options["png_compress_level"])
+        for widget in (self.quality_spin, self.progressive_check, self.png_level_spin):
+            widget.blockSignals(False)
+
+    def on_preset_changed(self, index):
+        preset = self.preset_combo.currentData()
+        self.apply_encoder_preset(preset)
+        self.emit_encoder_settings()
+        print(f"编码预设已更改为: {self.preset_combo.currentText()}")
+
+    def get_encoder_options(self):
+        """按当前预设和控件中的值生成编码参数"""
+        return get_encoder_options(
+            self.preset_combo.currentData(),
+            jpeg_quality=self.quality_spin.value(),
+            jpeg_progressive=self.progressive_check.isChecked(),
+            png_compress_level=self.png_level_spin.value(),
+        )
+
+    def emit_encoder_settings(self, *args):
+        self.encoder_settings_changed.emit(self.get_encoder_options())
+
     def on_naming_rule_changed(self, index):
         rule = self.naming_rule_combo.currentText()
         # 控制前缀/后缀输入框的显示状态
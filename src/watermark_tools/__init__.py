@@ -1,23 +1,65 @@
 # watermark_tools 包初始化文件
 
-from .exif_utils import get_image_exif_data, get_photo_datetime
-from .watermark_processor import add_watermark_to_image
-from .file_handler import check_file_exists, check_supported_format, check_watermark_suffix
+from .exif_utils import get_image_exif_data, get_photo_datetime, extract_exif_data, get_photo_date_or_today, get_fallback_date
+from .image_io import load_source_image
+from .watermark_processor import add_watermark_to_image, watermark_image, watermark_file, save_watermarked_image, get_encoder_options, watermark_preview
+from .font_manager import get_font, resolve_font_path, set_font_path, clear_font_cache
+from .watermark_plan import WatermarkPlan, compile_watermark_plan
+from .manifest import ProcessingManifest, settings_fingerprint
+from .profiling import ProfileReport, enable_profiling, profiling_enabled, profile_stage, start_file_profile, finish_file_profile
+from .thumbnail_cache import ThumbnailCache, default_cache_dir, load_thumbnail
+from .stamp_cache import get_stamp_cache_stats, set_stamp_cache_size, clear_stamp_cache
+from .file_handler import check_file_exists, check_supported_format, check_watermark_suffix, iter_image_files
 from .config import SUPPORTED_FORMATS, DEFAULT_FONT_SIZE, DEFAULT_WATERMARK_POSITION, DEFAULT_WATERMARK_COLOR
-from .batch_processor import process_directory, create_output_directory, process_single_file
+from .batch_processor import process_directory, create_output_directory, process_single_file, ExportResult, export_single_file, iter_export_jobs, iter_export_images, batch_export_images
 
 __all__ = [
     'get_image_exif_data',
     'get_photo_datetime', 
+    'extract_exif_data',
+    'get_photo_date_or_today',
+    'get_fallback_date',
+    'load_source_image',
     'add_watermark_to_image',
+    'watermark_image',
+    'watermark_file',
+    'save_watermarked_image',
+    'get_encoder_options',
+    'watermark_preview',
+    'get_font',
+    'resolve_font_path',
+    'set_font_path',
+    'clear_font_cache',
+    'WatermarkPlan',
+    'compile_watermark_plan',
+    'ProcessingManifest',
+    'settings_fingerprint',
+    'ProfileReport',
+    'enable_profiling',
+    'profiling_enabled',
+    'profile_stage',
+    'start_file_profile',
+    'finish_file_profile',
+    'ThumbnailCache',
+    'default_cache_dir',
+    'load_thumbnail',
+    'get_stamp_cache_stats',
+    'set_stamp_cache_size',
+    'clear_stamp_cache',
     'check_file_exists',
     'check_supported_format',
     'check_watermark_suffix',
+    'iter_image_files',
     'SUPPORTED_FORMATS',
     'DEFAULT_FONT_SIZE',
     'DEFAULT_WATERMARK_POSITION',
     'DEFAULT_WATERMARK_COLOR',
     'process_directory',
     'create_output_directory',
-    'process_single_file'
+    'process_single_file',
+    'ExportResult',
+    'export_single_file',
+    'iter_export_jobs',
+    'iter_export_images',
+    'batch_export_images'
 ]
\ No newline at end of file
@@ -10,27 +10,187 @@ def batch_export_images(
     output_dir=None,
     prefix="",
     suffix="",
-    naming_rule=0
+    naming_rule=0,
+    plan=None,
+    workers=1,
+    max_memory_mb=None,
+    pipeline=False,
+    stage_workers=None,
+    encoder_options=None
 ):
-    if not image_paths:
-        print("未选择图片")
+    output_dirs = []
+    success_count = 0
+    for result in iter_export_images(
+        image_paths,
+        position=position,
+        font_size=font_size,
+        color=color,
+        watermark_text=watermark_text,
+        transparency=transparency,
+        output_format=output_format,
+        output_dir=output_dir,
+        prefix=prefix,
+        suffix=suffix,
+        naming_rule=naming_rule,
+        plan=plan,
+        workers=workers,
+        max_memory_mb=max_memory_mb,
+        pipeline=pipeline,
+        stage_workers=stage_workers,
+        encoder_options=encoder_options,
+        output_dir_callback=output_dirs.append,
+    ):
+        if result.success:
+            success_count += 1
+    if not output_dirs:
         return 0
+    print(f"批量导出完成，成功处理了 {success_count} 个文件，输出目录: {output_dirs[0]}")
+    return success_count
+
+
+import io
+import os
+import sys
+import time
+import itertools
+from collections import namedtuple, deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from PIL import UnidentifiedImageError
+from .config import (
+    SUPPORTED_FORMATS,
+    PARALLEL_CHUNK_SIZE,
+    PIPELINE_STAGE_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+)
+from .file_handler import (
+    check_file_exists,
+    check_supported_format,
+    check_watermark_suffix,
+    iter_image_files,
+)
+from .watermark_processor import (
+    write_watermarked_file,
+    resolve_output_format,
+    watermark_image,
+    encode_watermarked_image,
+    OPAQUE_OUTPUT_FORMATS,
+)
+from .pipeline import StagedPipeline
+from .exif_utils import get_photo_date_or_today
+from .image_io import open_image_header, load_source_image
+from .large_image import probe_strip_layout, write_watermarked_strips
+from .watermark_plan import WatermarkPlan, compile_watermark_plan
+from .font_manager import set_font_path
+from .manifest import ProcessingManifest, settings_fingerprint, ENTRY_UNCHANGED, ENTRY_STALE
+from .profiling import (
+    enable_profiling,
+    profiling_enabled,
+    profile_stage,
+    start_file_profile,
+    finish_file_profile,
+)
+
+
+# 增量处理时每成功处理多少个文件保存一次清单
+MANIFEST_SAVE_INTERVAL = 100
+
+# 估算按行带处理的图片内存时计入的行数
+STRIP_BUFFER_ROWS = 1024
+
+
+# 单个文件的处理结果，timings 为各阶段耗时（秒），至少包含 total；
+# 启用性能分析（见profiling模块）时还包含解码、EXIF、编码、写入等细分阶段
+ExportResult = namedtuple(
+    'ExportResult',
+    ['input_path', 'output_path', 'success', 'error', 'timings', 'bytes_written'],
+)
+
+
+def iter_export_images(
+    image_paths,
+    position=None,
+    font_size=None,
+    color=None,
+    watermark_text=None,
+    transparency=None,
+    output_format="JPEG",
+    output_dir=None,
+    prefix="",
+    suffix="",
+    naming_rule=0,
+    plan=None,
+    workers=1,
+    ordered=True,
+    max_memory_mb=None,
+    pipeline=False,
+    stage_workers=None,
+    encoder_options=None,
+    output_dir_callback=None,
+    mp_context=None,
+    chunk_size=None
+):
+    """
+    流式批量导出图片，每处理完一个文件就产出一条结果
+
+    输入路径按需逐个读取，不会一次性构建完整列表；调用方停止迭代即可提前结束任务。
+
+    Args:
+        image_paths: 输入图片路径的可迭代对象
+        position: 水印位置
+        font_size: 字体大小
+        color: 水印颜色
+        watermark_text: 自定义水印文本，为空时使用拍摄日期
+        transparency: 水印透明度 (0-100)
+        output_format: 导出格式（JPEG、PNG），其他值保留原扩展名
+        output_dir: 输出目录，为空时在第一个文件所在目录下创建_watermark目录
+        prefix: 命名规则为1时添加的文件名前缀
+        suffix: 命名规则为2时添加的文件名后缀
+        naming_rule: 命名规则，0保留原文件名，1添加前缀，2添加后缀
+        plan: 预先编译的水印方案，提供时忽略上述水印参数
+        workers: 并行处理的进程数，为1时在当前进程中逐个处理，为0或None时使用全部CPU
+        ordered: 是否按输入顺序产出结果，为False时按完成顺序产出
+        max_memory_mb: 并行处理时在途任务的内存预算（MB），为None时不限制
+        pipeline: 是否在当前进程中以多阶段流水线处理
+        stage_workers: 流水线各阶段的线程数字典
+        encoder_options: 编码参数（见get_encoder_options），为None时使用Pillow默认值
+        output_dir_callback: 确定输出目录后调用的函数，参数为输出目录路径
+        mp_context: 并行处理时创建工作进程的multiprocessing上下文，为None时使用默认方式
+        chunk_size: 并行处理时每次分发给工作进程的最大文件数，为None时使用PARALLEL_CHUNK_SIZE
+
+    Yields:
+        ExportResult: 单个文件的处理结果
+    """
+    paths = iter(image_paths)
+    first_path = next(paths, None)
+    if first_path is None:
+        print("未选择图片")
+        return
+    paths = itertools.chain([first_path], paths)
+
     # 如果用户指定了导出目录，则使用，否则保持原有逻辑
     if output_dir:
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
     else:
-        first_dir = os.path.dirname(image_paths[0]) if image_paths else os.getcwd()
-        output_dir = create_output_directory(first_dir)
+        output_dir = create_output_directory(os.path.dirname(first_path) or os.getcwd())
         if not output_dir:
-            return 0
-    success_count = 0
-    for file_path in image_paths:
-        if check_supported_format(file_path):
+            return
+    if output_dir_callback is not None:
+        output_dir_callback(output_dir)
+
+    # 批处理开始前只编译一次水印方案，所有文件共用
+    if plan is None:
+        plan = compile_watermark_plan(
+            watermark_text, position, font_size, color, transparency
+        )
+
+    ext_map = {"JPEG": ".jpeg", "PNG": ".png"}
+
+    def generate_jobs():
+        for file_path in paths:
             # 生成自定义文件名
             file_name = os.path.basename(file_path)
             base_name, extension = os.path.splitext(file_name)
-            ext_map = {"JPEG": ".jpeg", "PNG": ".png"}
             out_ext = ext_map.get(output_format.upper(), extension)
             if naming_rule == 1 and prefix:
                 output_file_name = f"{prefix}{base_name}{out_ext}"
@@ -38,32 +198,20 @@ def batch_export_images(
                 output_file_name = f"{base_name}{suffix}{out_ext}"
             else:
                 output_file_name = f"{base_name}{out_ext}"
-            output_file = os.path.join(output_dir, output_file_name)
-            if process_single_file(
-                file_path,
-                output_file,
-                position,
-                font_size,
-                color,
-                output_format,
-                watermark_text=watermark_text,
-                transparency=transparency
-            ):
-                success_count += 1
-    print(f"批量导出完成，成功处理了 {success_count} 个文件，输出目录: {output_dir}")
-    return success_count
-
+            yield (file_path, os.path.join(output_dir, output_file_name), output_format)
 
-import os
-import sys
-from .config import SUPPORTED_FORMATS
-from .file_handler import (
-    check_file_exists,
-    check_supported_format,
-    check_watermark_suffix,
-)
-from .exif_utils import get_image_exif_data, get_photo_datetime
-from .watermark_processor import add_watermark_to_image
+    yield from iter_export_jobs(
+        generate_jobs(),
+        plan,
+        workers,
+        ordered,
+        max_memory_mb,
+        pipeline,
+        stage_workers,
+        encoder_options,
+        mp_context,
+        chunk_size,
+    )
 
 
 def create_output_directory(input_dir):
@@ -97,15 +245,48 @@ def create_output_directory(input_dir):
     return output_dir
 
 
-def process_directory(input_dir, position=None, font_size=None, color=None):
+def process_directory(
+    input_dir,
+    position=None,
+    font_size=None,
+    color=None,
+    plan=None,
+    workers=1,
+    recursive=False,
+    include=None,
+    exclude=None,
+    follow_symlinks=False,
+    incremental=False,
+    use_hash=False,
+    max_memory_mb=None,
+    pipeline=False,
+    stage_workers=None,
+    encoder_options=None,
+    result_callback=None
+):
     """
     处理目录中的所有支持的图片文件
 
+    文件边遍历边提交处理，无需等待目录遍历完成；递归处理时输出目录中保持原有的子目录结构。
+
     Args:
         input_dir: 输入目录路径
         position: 水印位置
         font_size: 字体大小
         color: 水印颜色
+        plan: 预先编译的水印方案，提供时忽略position、font_size和color
+        workers: 并行处理的进程数，为1时在当前进程中逐个处理
+        recursive: 是否递归处理子目录
+        include: 只处理匹配这些通配符模式的文件
+        exclude: 跳过匹配这些通配符模式的文件和目录
+        follow_symlinks: 是否跟随符号链接
+        incremental: 是否启用增量处理，跳过源文件和设置均未变化的文件
+        use_hash: 增量处理时是否比较源文件内容摘要，修改时间变化但内容相同的文件同样跳过
+        max_memory_mb: 并行处理时在途任务的内存预算（MB），为None时不限制
+        pipeline: 是否在当前进程中以多阶段流水线处理，启用时忽略workers
+        stage_workers: 流水线各阶段的线程数字典
+        encoder_options: 编码参数（见get_encoder_options），为None时使用Pillow默认值
+        result_callback: 每个文件处理完成后调用的函数，参数为ExportResult
 
     Returns:
         int: 成功处理的文件数量
@@ -120,39 +301,578 @@ def process_directory(input_dir, position=None, font_size=None, color=None):
     if not output_dir:
         return 0
 
-    # 只处理当前目录中的文件（不递归处理子目录）
+    # 整个目录只编译一次水印方案
+    if plan is None:
+        plan = compile_watermark_plan(None, position, font_size, color)
+
+    # 增量处理时读取输出目录中的处理清单
+    manifest = None
+    if incremental:
+        manifest = ProcessingManifest(
+            output_dir, settings_fingerprint(plan, encoder_options=encoder_options), use_hash
+        )
+        manifest.load()
+    # 已提交处理的文件对应的 (清单键, 源文件签名)
+    signatures = {}
+    counts = {'skipped': 0, 'stale': 0, 'pruned': 0}
+    # 输入目录是否已完整遍历，只有完整遍历后才能清理清单中的过期条目
+    walk_done = False
+
+    def generate_jobs():
+        nonlocal walk_done
+        # 输出目录位于输入目录内，遍历时跳过
+        for file_path in iter_image_files(
+            input_dir,
+            recursive=recursive,
+            include=include,
+            exclude=exclude,
+            follow_symlinks=follow_symlinks,
+            exclude_dirs=[output_dir],
+        ):
+            # 输出文件名格式为：原文件名_watermark.原扩展名
+            rel_dir = os.path.relpath(os.path.dirname(file_path), input_dir)
+            target_dir = os.path.normpath(os.path.join(output_dir, rel_dir))
+            base_name, extension = os.path.splitext(os.path.basename(file_path))
+            output_file = os.path.join(target_dir, f"{base_name}_watermark{extension}")
+
+            if manifest is not None:
+                key = os.path.relpath(file_path, input_dir).replace(os.sep, '/')
+                try:
+                    status, signature = manifest.check(key, file_path, output_file)
+                except OSError as e:
+                    print(f"读取文件 '{file_path}' 信息时出错: {e}")
+                    continue
+                if status == ENTRY_UNCHANGED:
+                    counts['skipped'] += 1
+                    continue
+                if status == ENTRY_STALE:
+                    counts['stale'] += 1
+                signatures[file_path] = (key, signature)
+
+            if not os.path.isdir(target_dir):
+                try:
+                    os.makedirs(target_dir, exist_ok=True)
+                except Exception as e:
+                    print(f"创建输出目录时出错: {e}")
+                    continue
+
+            # 输出格式由扩展名决定
+            yield (file_path, output_file, None)
+        walk_done = True
+
     success_count = 0
     try:
-        # 获取当前目录中的所有文件
-        files = [
-            f
-            for f in os.listdir(input_dir)
-            if os.path.isfile(os.path.join(input_dir, f))
-        ]
-
-        for file in files:
-            # 构建完整的文件路径
-            file_path = os.path.join(input_dir, file)
-
-            # 检查文件格式是否支持
-            if not check_supported_format(file_path):
+        for result in iter_export_jobs(
+            generate_jobs(),
+            plan,
+            workers,
+            max_memory_mb=max_memory_mb,
+            pipeline=pipeline,
+            stage_workers=stage_workers,
+            encoder_options=encoder_options,
+        ):
+            entry = signatures.pop(result.input_path, None)
+            if result_callback is not None:
+                result_callback(result)
+            if not result.success:
                 continue
+            success_count += 1
+            if entry is not None:
+                key, signature = entry
+                manifest.record(key, result.input_path, result.output_path, signature)
+                # 定期保存清单，中途中断时已完成的文件不必重新处理
+                if success_count % MANIFEST_SAVE_INTERVAL == 0:
+                    manifest.save()
+    finally:
+        if manifest is not None:
+            if walk_done:
+                counts['pruned'] = manifest.prune()
+            manifest.save()
+
+    if manifest is not None:
+        print(
+            f"增量处理: 处理 {success_count} 个文件，跳过 {counts['skipped']} 个未变化的文件，"
+            f"其中 {counts['stale']} 个文件因源文件或设置变化而重新处理，"
+            f"清理 {counts['pruned']} 条已不存在的源文件记录"
+        )
+    return success_count
+
+
+# 工作进程中重建的水印方案，由进程池初始化函数设置
+_worker_plan = None
+_worker_encoder_options = None
+
+
+def _init_export_worker(plan_settings, encoder_options=None, profile=False):
+    """
+    工作进程初始化函数：预先加载字体并编译水印方案，进程内所有任务共用
+    """
+    global _worker_plan, _worker_encoder_options
+    enable_profiling(profile)
+    font_path = plan_settings.get('font_path')
+    if font_path:
+        set_font_path(font_path)
+    _worker_plan = WatermarkPlan(**plan_settings)
+    _worker_encoder_options = encoder_options
+
+
+def _export_job_chunk(jobs):
+    """
+    在工作进程中处理一组文件，只传递路径而不传递像素数据
+
+    Returns:
+        list: 每个文件的处理结果（ExportResult）
+    """
+    return [
+        export_single_file(
+            file_path, output_file, output_format, _worker_plan, _worker_encoder_options
+        )
+        for file_path, output_file, output_format in jobs
+    ]
+
+
+def _iter_job_chunks(jobs, chunk_size, initial_size=None):
+    """
+    按需从任务迭代器中切出任务块
+
+    提供initial_size时块大小从该值开始逐块翻倍直到chunk_size，
+    使任务数未知的小批量也能尽快分配到所有工作进程。
+    """
+    jobs = iter(jobs)
+    size = initial_size or chunk_size
+    while True:
+        chunk = list(itertools.islice(jobs, size))
+        if not chunk:
+            return
+        yield chunk
+        size = min(size * 2, chunk_size)
+
+
+def estimate_job_memory(file_path, output_file, output_format=None):
+    """
+    在解码前读取图片头信息，估算处理单个文件时的峰值内存
+
+    Pillow中RGB和RGBA图片每像素占4字节；源图片需要转换模式（如调色板、灰度图片，
+    或导出为JPEG的带透明通道图片）时会同时存在两份完整图片。按行带处理的图片只计算行带缓冲。
+
+    Args:
+        file_path: 输入文件路径
+        output_file: 输出文件路径
+        output_format: 导出格式，为None时由输出文件扩展名决定
+
+    Returns:
+        int: 估算的峰值字节数，无法读取头信息时返回0
+    """
+    extension = resolve_output_format(output_file, output_format)
+    try:
+        layout = probe_strip_layout(file_path, extension)
+        if layout is not None:
+            return layout[0][0] * 4 * STRIP_BUFFER_ROWS
+        with open_image_header(file_path) as image:
+            width, height = image.size
+            mode = image.mode
+    except Exception:
+        # 无法读取的文件会在处理时报告错误，不占用预算
+        return 0
+    copies = 1
+    if mode not in ('RGB', 'RGBA') or (mode == 'RGBA' and extension in OPAQUE_OUTPUT_FORMATS):
+        copies = 2
+    return width * height * 4 * copies
+
 
-            # 处理单个文件，传递自定义参数
-            if process_single_file(
-                file_path,
-                output_dir,
-                input_dir,
-                position,
-                font_size,
-                color,
-                output_format="JPEG",
+def _collect_finished_chunks(pending, ordered):
+    """
+    等待在途任务块完成并产出其中每个文件的结果
+
+    Args:
+        pending: (future, 任务块, 预计内存) 队列，已取出的项会从中移除
+        ordered: 为True时按提交顺序等待队首的块，否则取任意已完成的块
+    """
+    if ordered:
+        finished = [pending.popleft()]
+    else:
+        done, _ = wait([item[0] for item in pending], return_when=FIRST_COMPLETED)
+        finished = [item for item in pending if item[0] in done]
+        for item in finished:
+            pending.remove(item)
+
+    for future, chunk, _ in finished:
+        try:
+            chunk_results = future.result()
+        except Exception as e:
+            # 工作进程异常退出时，该块中的文件均视为失败
+            print(f"并行处理时出错: {e}")
+            chunk_results = [
+                ExportResult(file_path, output_file, False, str(e), {'total': 0.0}, 0)
+                for file_path, output_file, _ in chunk
+            ]
+        yield from chunk_results
+
+
+def iter_export_jobs(
+    jobs,
+    plan,
+    workers=1,
+    ordered=True,
+    max_memory_mb=None,
+    pipeline=False,
+    stage_workers=None,
+    encoder_options=None,
+    mp_context=None,
+    chunk_size=None
+):
+    """
+    流式执行导出任务，每完成一个文件就产出一条结果
+
+    任务按需从输入中读取；并行时在途的任务块数量有上限，
+    调用方提前停止迭代时尚未开始的任务会被取消。
+    指定内存预算时，提交前根据图片头信息估算每个任务块的峰值内存，
+    只有在途任务的估算总和不超过预算时才提交新的任务块：大图片自动串行处理，小图片仍完全并行。
+
+    Args:
+        jobs: (输入文件路径, 输出文件路径, 导出格式) 的可迭代对象
+        plan: 预先编译的水印方案
+        workers: 并行处理的进程数，为1时在当前进程中逐个处理，为0或None时使用全部CPU
+        ordered: 是否按任务顺序产出结果，为False时按完成顺序产出
+        max_memory_mb: 并行处理时在途任务的内存预算（MB），为None时不限制
+        pipeline: 是否在当前进程中以多阶段流水线处理，启用时忽略workers和max_memory_mb
+        stage_workers: 流水线各阶段的线程数，见iter_pipeline_jobs
+        encoder_options: 编码参数（见get_encoder_options），为None时使用Pillow默认值
+        mp_context: 创建工作进程的multiprocessing上下文，为None时使用默认方式；
+            在已启动其他线程的进程（如GUI）中应使用spawn，避免fork时复制其他线程持有的锁
+        chunk_size: 每次分发给工作进程的最大文件数，为None时使用PARALLEL_CHUNK_SIZE；
+            块越小，调用方停止迭代后仍会完成的在途文件越少
+
+    Yields:
+        ExportResult: 单个文件的处理结果
+    """
+    if pipeline:
+        yield from iter_pipeline_jobs(
+            jobs, plan, stage_workers, ordered, encoder_options=encoder_options
+        )
+        return
+    if not workers or workers < 1:
+        workers = os.cpu_count() or 1
+    max_chunk_size = chunk_size or PARALLEL_CHUNK_SIZE
+    chunk_size = max_chunk_size
+    initial_size = 1
+    # 任务数已知时按数量调整进程数和块大小，否则块大小从1开始逐步增大
+    if hasattr(jobs, '__len__'):
+        workers = min(workers, len(jobs))
+        if workers > 1:
+            chunk_size = max(1, min(max_chunk_size, len(jobs) // (workers * 4)))
+        initial_size = None
+    if workers <= 1:
+        for file_path, output_file, output_format in jobs:
+            yield export_single_file(
+                file_path, output_file, output_format, plan, encoder_options
+            )
+        return
+
+    # 按块分发文件路径，减少进程间通信次数
+    max_pending = workers * 2
+    budget = max_memory_mb * 1024 * 1024 if max_memory_mb else None
+    pending = deque()
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp_context,
+        initializer=_init_export_worker,
+        initargs=(plan.settings(), encoder_options, profiling_enabled()),
+    )
+    try:
+        for chunk in _iter_job_chunks(jobs, chunk_size, initial_size):
+            # 块内文件在同一进程中依次处理，块的峰值内存取其中最大的文件
+            estimate = max(estimate_job_memory(*job) for job in chunk) if budget else 0
+            # 在途任务块已满或预计内存超出预算时，先等待已提交的任务完成；
+            # 没有在途任务时总是提交，单个文件超出预算时独自运行
+            while pending and (
+                len(pending) >= max_pending
+                or (budget and sum(item[2] for item in pending) + estimate > budget)
             ):
-                success_count += 1
-    except Exception as e:
-        print(f"遍历目录文件时出错: {e}")
+                yield from _collect_finished_chunks(pending, ordered)
+            pending.append((executor.submit(_export_job_chunk, chunk), chunk, estimate))
+        while pending:
+            yield from _collect_finished_chunks(pending, ordered)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
 
-    return success_count
+
+def run_export_jobs(jobs, plan, workers=1, max_memory_mb=None, encoder_options=None):
+    """
+    执行一组导出任务，结果顺序与任务顺序一致
+
+    Args:
+        jobs: (输入文件路径, 输出文件路径, 导出格式) 列表
+        plan: 预先编译的水印方案
+        workers: 并行处理的进程数，为1时在当前进程中逐个处理，为0或None时使用全部CPU
+        max_memory_mb: 并行处理时在途任务的内存预算（MB），为None时不限制
+        encoder_options: 编码参数（见get_encoder_options），为None时使用Pillow默认值
+
+    Returns:
+        list: 每个任务是否成功处理
+    """
+    return [
+        result.success
+        for result in iter_export_jobs(
+            jobs, plan, workers, max_memory_mb=max_memory_mb, encoder_options=encoder_options
+        )
+    ]
+
+
+def check_export_source(file_path):
+    """
+    检查源文件能否导出
+
+    Args:
+        file_path: 输入文件路径
+
+    Returns:
+        str: 不能导出的原因，可以导出时返回None
+    """
+    # 检查文件格式是否支持
+    if not check_supported_format(file_path):
+        return "不支持的文件格式"
+    # 检查文件是否存在
+    if not check_file_exists(file_path):
+        return "文件不存在"
+    # 检查文件名是否已经以_watermark结尾
+    if check_watermark_suffix(file_path):
+        return "文件名已以_watermark结尾"
+    return None
+
+
+class _PipelineTask:
+    """流水线中单个文件的处理状态，依次经过读取、解码、水印、编码和写入阶段"""
+
+    __slots__ = (
+        'index', 'file_path', 'output_file', 'extension', 'data', 'image',
+        'text', 'error', 'done', 'timings', 'bytes_written', 'started', 'finished',
+    )
+
+    def __init__(self, index, file_path, output_file, output_format):
+        self.index = index
+        self.file_path = file_path
+        self.output_file = output_file
+        self.extension = output_format.lower() if output_format else None
+        self.data = None
+        self.image = None
+        self.text = None
+        self.error = None
+        self.done = False
+        self.timings = {}
+        self.bytes_written = 0
+        self.started = None
+        self.finished = None
+
+    def result(self):
+        """释放图片数据并生成处理结果"""
+        self.data = None
+        self.image = None
+        if self.started is not None and self.finished is not None:
+            self.timings['total'] = self.finished - self.started
+        else:
+            self.timings['total'] = sum(self.timings.values())
+        return ExportResult(
+            self.file_path, self.output_file, self.error is None,
+            self.error, self.timings, self.bytes_written,
+        )
+
+
+def _pipeline_stage(name, func):
+    """
+    包装流水线阶段函数：记录阶段耗时，已失败或已完成的任务直接传给下一阶段
+
+    启用性能分析时不记录整个阶段的耗时，而是由各计时点记录细分阶段的耗时。
+    读取阶段开始时和写入阶段结束时分别记录时间戳，total与其他导出方式一样为墙钟耗时，
+    其中包括在阶段之间排队等待的时间。
+    """
+    def run(task):
+        if task.started is None:
+            task.started = time.perf_counter()
+        try:
+            if task.error is not None or task.done:
+                return task
+            if start_file_profile(task.timings) is not None:
+                try:
+                    func(task)
+                finally:
+                    finish_file_profile()
+                return task
+            start = time.perf_counter()
+            try:
+                func(task)
+            finally:
+                task.timings[name] = time.perf_counter() - start
+            return task
+        finally:
+            if name == 'write':
+                task.finished = time.perf_counter()
+    return run
+
+
+def _read_stage(task, plan):
+    """读取阶段：检查源文件并将文件内容读入内存"""
+    with profile_stage('check'):
+        task.error = check_export_source(task.file_path)
+    if task.error is not None:
+        return
+    # 超大的未压缩图片按行带处理，不读入整个文件
+    task.text = plan.resolve_text()
+    extension = resolve_output_format(task.output_file, task.extension)
+    if write_watermarked_strips(task.file_path, task.output_file, plan, None, extension):
+        task.bytes_written = os.path.getsize(task.output_file)
+        task.done = True
+        return
+    with profile_stage('read'):
+        with open(task.file_path, 'rb') as f:
+            task.data = f.read()
+
+
+def _decode_stage(task):
+    """解码阶段：从内存中的文件内容解码像素，需要时读取拍摄日期作为水印文本"""
+    try:
+        image, exif_data = load_source_image(io.BytesIO(task.data), read_exif=not task.text)
+    except UnidentifiedImageError:
+        # 错误信息中使用文件路径，与直接从文件解码时一致
+        raise UnidentifiedImageError(f"cannot identify image file '{task.file_path}'")
+    task.data = None
+    if not task.text:
+        task.text = get_photo_date_or_today(exif_data, task.file_path)
+    task.image = image
+
+
+def _watermark_stage(task, plan):
+    """水印阶段：在解码后的图片上混合水印"""
+    task.image = watermark_image(task.image, task.text, plan, in_place=True)
+
+
+def _encode_stage(task, encoder_options):
+    """编码阶段：按导出格式将图片编码为字节串"""
+    task.data = encode_watermarked_image(
+        task.image, task.output_file, task.extension, encoder_options
+    )
+    task.image = None
+
+
+def _write_stage(task):
+    """写入阶段：将编码后的数据写入输出文件"""
+    with profile_stage('write'):
+        with open(task.output_file, 'wb') as f:
+            f.write(task.data)
+    task.bytes_written = len(task.data)
+    task.data = None
+
+
+def _pipeline_error(task, stage, error):
+    """流水线阶段出错时记录错误，任务继续传递以便产出失败结果"""
+    print(f"添加水印时出错: {error}")
+    task.error = str(error)
+    task.data = None
+    task.image = None
+    return task
+
+
+def iter_pipeline_jobs(
+    jobs,
+    plan,
+    stage_workers=None,
+    ordered=True,
+    queue_size=PIPELINE_QUEUE_SIZE,
+    encoder_options=None
+):
+    """
+    以多阶段流水线在当前进程中执行导出任务
+
+    读取、解码、水印、编码和写入分别由独立的线程组处理，阶段之间通过有界队列连接，
+    一张图片在编码或写入时下一张图片已经在读取和解码，磁盘（或网络存储）和CPU可以同时工作。
+
+    Args:
+        jobs: (输入文件路径, 输出文件路径, 导出格式) 的可迭代对象
+        plan: 预先编译的水印方案
+        stage_workers: 各阶段线程数的字典（read、decode、watermark、encode、write），
+                       未指定的阶段使用PIPELINE_STAGE_WORKERS中的默认值
+        ordered: 是否按任务顺序产出结果，为False时按完成顺序产出
+        queue_size: 阶段之间队列的容量
+        encoder_options: 编码参数（见get_encoder_options），为None时使用Pillow默认值
+
+    Yields:
+        ExportResult: 单个文件的处理结果
+    """
+    workers = dict(PIPELINE_STAGE_WORKERS)
+    workers.update(stage_workers or {})
+    stages = [
+        ('read', lambda task: _read_stage(task, plan)),
+        ('decode', _decode_stage),
+        ('watermark', lambda task: _watermark_stage(task, plan)),
+        ('encode', lambda task: _encode_stage(task, encoder_options)),
+        ('write', _write_stage),
+    ]
+    pipeline = StagedPipeline(
+        [(name, _pipeline_stage(name, func), workers[name]) for name, func in stages],
+        queue_size=queue_size,
+        on_error=_pipeline_error,
+    )
+    tasks = (
+        _PipelineTask(index, file_path, output_file, output_format)
+        for index, (file_path, output_file, output_format) in enumerate(jobs)
+    )
+
+    # 按任务顺序产出时，暂存先完成的结果
+    waiting = {}
+    next_index = 0
+    for task in pipeline.run(tasks):
+        if task.error is None:
+            print(f"已成功添加水印并保存到: {task.output_file}")
+        if not ordered:
+            yield task.result()
+            continue
+        waiting[task.index] = task
+        while next_index in waiting:
+            yield waiting.pop(next_index).result()
+            next_index += 1
+
+
+def export_single_file(file_path, output_file, output_format=None, plan=None, encoder_options=None):
+    """
+    处理单个图片文件并返回详细结果
+
+    Args:
+        file_path: 输入文件路径
+        output_file: 输出文件完整路径
+        output_format: 导出格式，为None时由输出文件扩展名决定
+        plan: 预先编译的水印方案
+        encoder_options: 编码参数（见get_encoder_options），为None时使用Pillow默认值
+
+    Returns:
+        ExportResult: 处理结果，包含是否成功、错误信息、耗时和写入字节数
+    """
+    start = time.perf_counter()
+    bytes_written = 0
+    # 启用性能分析时记录各阶段耗时，否则只记录总耗时
+    timings = start_file_profile()
+    if timings is None:
+        timings = {}
+
+    with profile_stage('check'):
+        error = check_export_source(file_path)
+    if error is None:
+        try:
+            # 添加水印，源文件只打开一次；方案中没有自定义水印文本时，
+            # 从同一文件句柄读取拍摄日期作为水印
+            # 将output_format转换为小写的扩展名格式
+            extension = output_format.lower() if output_format else None
+            write_watermarked_file(
+                file_path, output_file, plan, extension=extension, encoder_options=encoder_options
+            )
+            bytes_written = os.path.getsize(output_file)
+            print(f"已成功添加水印并保存到: {output_file}")
+        except Exception as e:
+            print(f"添加水印时出错: {e}")
+            error = str(e)
+
+    finish_file_profile()
+    timings['total'] = time.perf_counter() - start
+    return ExportResult(file_path, output_file, error is None, error, timings, bytes_written)
 
 
 def process_single_file(
@@ -163,7 +883,9 @@ def process_single_file(
     color=None,
     output_format="JPEG",
     watermark_text=None,
-    transparency=None
+    transparency=None,
+    plan=None,
+    encoder_options=None
 ):
     """
     处理单个图片文件
@@ -174,49 +896,23 @@ def process_single_file(
         position: 水印位置
         font_size: 字体大小
         color: 水印颜色
+        output_format: 导出格式，为None时由输出文件扩展名决定
+        watermark_text: 自定义水印文本，为空时使用拍摄日期
+        transparency: 水印透明度 (0-100)
+        plan: 预先编译的水印方案，提供时忽略上述水印参数
+        encoder_options: 编码参数（见get_encoder_options），为None时使用Pillow默认值
 
     Returns:
         bool: 是否成功处理
     """
-    # 检查文件是否存在
-    if not check_file_exists(file_path):
-        return False
-
-    # 检查文件名是否已经以_watermark结尾
-    if check_watermark_suffix(file_path):
-        return False
-
     try:
-        # 获取EXIF数据
-        exif_data = get_image_exif_data(file_path)
-
-        # 获取拍摄日期
-        photo_date = get_photo_datetime(exif_data)
-
-        if not photo_date:
-            print(
-                f"警告: 无法从图片 '{file_path}' 中提取拍摄日期，使用当前日期作为替代"
+        if plan is None:
+            plan = compile_watermark_plan(
+                watermark_text, position, font_size, color, transparency
             )
-            from datetime import datetime
-
-            photo_date = datetime.now().strftime("%Y-%m-%d")
-
-        # 如果提供了自定义水印文本，则使用它，否则使用日期
-        final_watermark_text = watermark_text if watermark_text else photo_date
-        
-        # 添加水印，传递所有自定义参数
-        # 将output_format转换为小写的扩展名格式
-        extension = output_format.lower() if output_format else None
-        return add_watermark_to_image(
-            file_path, 
-            final_watermark_text, 
-            output_file, 
-            position, 
-            font_size, 
-            color,
-            transparency=transparency,
-            extension=extension
-        )
     except Exception as e:
         print(f"处理文件 '{file_path}' 时出错: {e}")
         return False
+    return export_single_file(
+        file_path, output_file, output_format, plan, encoder_options
+    ).success
@@ -20,3 +20,98 @@ DEFAULT_WATERMARK_TRANSPARENCY = 50
 
 # 默认导出格式PNG
 DEFAULT_EXPORT_FORMAT = "PNG"
+
+
+# 指定的水印字体文件路径，为None时按系统字体回退链自动查找
+WATERMARK_FONT_PATH = None
+
+# 字体对象缓存的最大条目数（按字体路径和字号缓存）
+FONT_CACHE_SIZE = 32
+
+# 水印图块缓存的内存上限（MB）
+STAMP_CACHE_SIZE_MB = 64
+
+# 并行批处理时每次分发给工作进程的最大文件数
+PARALLEL_CHUNK_SIZE = 16
+
+# 增量处理清单的文件名，保存在输出目录中
+MANIFEST_FILE_NAME = ".watermark_manifest.json"
+
+# 超过此像素数的未压缩BMP和TIFF图片按行带处理，只解码与水印相交的行
+LARGE_IMAGE_PIXELS = 50_000_000
+
+# 流水线模式下各阶段的默认线程数：读取和写入为I/O密集型，解码和编码期间Pillow释放GIL
+PIPELINE_STAGE_WORKERS = {
+    "read": 4,
+    "decode": 2,
+    "watermark": 1,
+    "encode": 2,
+    "write": 4,
+}
+
+# 流水线各阶段之间队列的容量，限制在途图片数量
+PIPELINE_QUEUE_SIZE = 8
+
+# 导出编码预设：fast压缩最快，balanced与Pillow默认参数一致，smallest以更多CPU时间换取更小的文件
+# Pillow默认的JPEG参数（基线、不优化哈夫曼表、4:2:0）已是编码最快的组合，
+# 因此fast与balanced只在PNG压缩级别上不同，导出JPEG时两者的输出完全相同
+ENCODER_PRESETS = {
+    "fast": {
+        "jpeg_quality": 75,
+        "jpeg_subsampling": "4:2:0",
+        "jpeg_progressive": False,
+        "jpeg_optimize": False,
+        "png_compress_level": 1,
+        "png_optimize": False,
+    },
+    "balanced": {
+        "jpeg_quality": 75,
+        "jpeg_subsampling": "4:2:0",
+        "jpeg_progressive": False,
+        "jpeg_optimize": False,
+        "png_compress_level": 6,
+        "png_optimize": False,
+    },
+    "smallest": {
+        "jpeg_quality": 75,
+        "jpeg_subsampling": "4:2:0",
+        "jpeg_progressive": True,
+        "jpeg_optimize": True,
+        "png_compress_level": 9,
+        "png_optimize": True,
+    },
+}
+
+# 默认编码预设
+DEFAULT_ENCODER_PRESET = "balanced"
+
+# --profile-report 的默认性能报告文件，扩展名为.csv时输出CSV，否则输出JSON
+DEFAULT_PROFILE_REPORT = "watermark_profile.json"
+
+# GUI中后台生成预览的线程数
+PREVIEW_WORKER_THREADS = 2
+
+# 拖拽水印时叠加层的刷新间隔（毫秒），约60帧每秒
+DRAG_OVERLAY_FRAME_MS = 16
+
+# GUI图片列表的缩略图边长（像素）、后台解码缩略图的线程数，
+# 以及在可见行之外预先加载缩略图的行数
+THUMBNAIL_SIZE = 128
+THUMBNAIL_WORKER_THREADS = 2
+THUMBNAIL_PREFETCH_ROWS = 20
+
+# 磁盘缩略图缓存在用户缓存目录中的应用目录名，以及缓存总大小上限（MB）
+THUMBNAIL_CACHE_DIR_NAME = "pic-watermark"
+THUMBNAIL_CACHE_SIZE_MB = 256
+
+# GUI预览缓存的内存上限（MB），以及其中用于缓存解码后代理图片的比例，
+# 其余部分缓存生成好的预览QPixmap
+PREVIEW_CACHE_SIZE_MB = 128
+PREVIEW_PROXY_CACHE_RATIO = 0.75
+
+# GUI导出时的并行进程数（0表示使用全部CPU），以及在途任务的内存预算（MB，None表示不限制）
+GUI_EXPORT_WORKERS = 0
+GUI_EXPORT_MAX_MEMORY_MB = 1024
+
+# GUI导出时每次分发给工作进程的文件数，较小的值使暂停和取消更快生效
+GUI_EXPORT_CHUNK_SIZE = 1
@@ -1,28 +1,44 @@
 import os
 from PIL import Image, ExifTags
+from .profiling import profile_stage
 
 
-def get_image_exif_data(image_path):
+def extract_exif_data(image):
     """
-    从图片中提取EXIF信息
+    从已打开的图片对象中提取EXIF信息
     
     Args:
-        image_path: 图片文件路径
+        image: 已打开的PIL图片对象
         
     Returns:
         dict: 包含EXIF信息的字典
     """
-    try:
-        image = Image.open(image_path)
-        exif_data = {}
-        # 尝试获取EXIF数据
+    exif_data = {}
+    # 尝试获取EXIF数据
+    with profile_stage('exif'):
         if hasattr(image, '_getexif'):
             exif = image._getexif()
             if exif:
                 for tag, value in exif.items():
                     tag_name = ExifTags.TAGS.get(tag, tag)
                     exif_data[tag_name] = value
-        return exif_data
+    return exif_data
+
+
+def get_image_exif_data(image_path):
+    """
+    从图片中提取EXIF信息
+    
+    Args:
+        image_path: 图片文件路径
+        
+    Returns:
+        dict: 包含EXIF信息的字典
+    """
+    try:
+        # 使用with确保文件句柄被及时关闭
+        with Image.open(image_path) as image:
+            return extract_exif_data(image)
     except Exception as e:
         print(f"获取EXIF信息时出错: {e}")
         return {}
@@ -54,4 +70,34 @@ def get_photo_datetime(exif_data):
                 except Exception as e:
                     print(f"解析日期时间时出错: {e}")
     
-    return None
\ No newline at end of file
+    return None
+
+
+def get_photo_date_or_today(exif_data, image_path):
+    """
+    从EXIF数据中提取拍摄日期，无法提取时使用当前日期作为替代
+    
+    Args:
+        exif_data: 包含EXIF信息的字典
+        image_path: 图片文件路径，用于输出警告
+        
+    Returns:
+        str: 格式化的日期字符串 (YYYY-MM-DD)
+    """
+    photo_date = get_photo_datetime(exif_data)
+    if not photo_date:
+        print(f"警告: 无法从图片 '{image_path}' 中提取拍摄日期，使用当前日期作为替代")
+        photo_date = get_fallback_date()
+    return photo_date
+
+
+def get_fallback_date():
+    """
+    获取无法提取拍摄日期时用作水印文本的当前日期
+
+    Returns:
+        str: 格式化的日期字符串 (YYYY-MM-DD)
+    """
+    from datetime import datetime
+
+    return datetime.now().strftime("%Y-%m-%d")
@@ -1,4 +1,5 @@
 import os
+import fnmatch
 from .config import SUPPORTED_FORMATS
 
 
@@ -52,4 +53,84 @@ def check_supported_format(file_path):
     if extension not in SUPPORTED_FORMATS:
         print(f"错误: 不支持的文件格式 '{extension}'。目前仅支持: {', '.join(SUPPORTED_FORMATS)}")
         return False
-    return True
\ No newline at end of file
+    return True
+
+def _match_any(patterns, name, rel_path):
+    """
+    判断文件名或相对路径是否匹配任一通配符模式
+    """
+    return any(
+        fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel_path, pattern)
+        for pattern in patterns
+    )
+
+
+def iter_image_files(
+    root_dir,
+    recursive=False,
+    include=None,
+    exclude=None,
+    follow_symlinks=False,
+    exclude_dirs=None
+):
+    """
+    基于os.scandir流式遍历目录中支持的图片文件，边遍历边产出
+
+    目录项类型直接取自os.scandir的结果，不再对每个文件额外调用stat。
+    已以_watermark结尾的文件、不支持的格式和exclude_dirs中的目录会被静默跳过。
+
+    Args:
+        root_dir: 要遍历的根目录
+        recursive: 是否递归遍历子目录
+        include: 通配符模式列表，非空时只产出文件名或相对路径匹配其一的文件
+        exclude: 通配符模式列表，文件名或相对路径匹配其一的文件和目录被跳过
+        follow_symlinks: 是否递归进入指向目录的符号链接；指向文件的链接总会被产出
+        exclude_dirs: 需要跳过的目录路径列表，如输出目录
+
+    Yields:
+        str: 图片文件路径
+    """
+    include = list(include or [])
+    exclude = list(exclude or [])
+    excluded = {os.path.realpath(d) for d in (exclude_dirs or [])}
+    # 跟随符号链接时记录已访问的目录，避免链接成环导致无限递归
+    visited = set()
+    pending = [root_dir]
+
+    while pending:
+        current_dir = pending.pop()
+        try:
+            if follow_symlinks:
+                stat = os.stat(current_dir)
+                key = (stat.st_dev, stat.st_ino)
+                if key in visited:
+                    continue
+                visited.add(key)
+            with os.scandir(current_dir) as entries:
+                subdirs = []
+                for entry in entries:
+                    rel_path = os.path.relpath(entry.path, root_dir).replace(os.sep, '/')
+                    if exclude and _match_any(exclude, entry.name, rel_path):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=follow_symlinks):
+                            if recursive and os.path.realpath(entry.path) not in excluded:
+                                subdirs.append(entry.path)
+                            continue
+                        # 指向文件的符号链接始终处理，follow_symlinks只影响目录的递归
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    base_name, extension = os.path.splitext(entry.name)
+                    if extension.lower() not in SUPPORTED_FORMATS:
+                        continue
+                    if base_name.lower().endswith('_watermark'):
+                        continue
+                    if include and not _match_any(include, entry.name, rel_path):
+                        continue
+                    yield entry.path
+                # 逆序入栈，使子目录按遍历到的顺序处理
+                pending.extend(reversed(subdirs))
+        except OSError as e:
+            print(f"遍历目录 '{current_dir}' 时出错: {e}")
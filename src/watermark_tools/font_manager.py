@@ -0,0 +1,109 @@
+import os
+from functools import lru_cache
+from PIL import ImageFont
+from .config import DEFAULT_FONT_SIZE, WATERMARK_FONT_PATH, FONT_CACHE_SIZE
+from .profiling import profile_stage
+
+
+# 系统字体回退链 - 根据操作系统尝试不同的中文字体
+if os.name == 'nt':  # Windows
+    FONT_FALLBACK_CHAIN = ["simhei.ttf", "Arial Unicode MS"]
+else:  # macOS/Linux
+    FONT_FALLBACK_CHAIN = ["WenQuanYi Micro Hei", "Arial Unicode MS"]
+
+# 通过CLI或配置指定的字体文件
+_pinned_font_path = WATERMARK_FONT_PATH
+# 进程内字体路径解析结果，只在首次使用时解析一次
+_font_path_resolved = False
+_resolved_font_path = None
+
+
+def set_font_path(font_path):
+    """
+    指定水印使用的字体文件，对当前进程后续的所有水印生效
+
+    Args:
+        font_path: 字体文件路径，为None时恢复按回退链自动查找
+
+    Returns:
+        bool: 字体是否可用
+    """
+    global _pinned_font_path, _font_path_resolved, _resolved_font_path
+    if font_path is not None:
+        try:
+            ImageFont.truetype(font_path, DEFAULT_FONT_SIZE)
+        except (IOError, OSError) as e:
+            print(f"错误: 无法加载字体文件 '{font_path}': {e}")
+            return False
+    _pinned_font_path = font_path
+    _font_path_resolved = False
+    _resolved_font_path = None
+    return True
+
+
+def resolve_font_path():
+    """
+    解析当前进程可用的水印字体路径
+
+    优先使用指定的字体文件，否则依次尝试系统字体回退链。解析结果在进程内缓存，
+    后续调用不会再进行文件系统查找。
+
+    Returns:
+        str: 字体文件路径，如果没有可用的TrueType字体则返回None（使用Pillow默认字体）
+    """
+    global _font_path_resolved, _resolved_font_path
+    if _font_path_resolved:
+        return _resolved_font_path
+
+    font_path = _pinned_font_path
+    if font_path is None:
+        for candidate in FONT_FALLBACK_CHAIN:
+            try:
+                # truetype会在系统字体目录中查找，记录找到的实际路径
+                font_path = ImageFont.truetype(candidate, DEFAULT_FONT_SIZE).path
+                break
+            except (IOError, OSError):
+                continue
+
+    _resolved_font_path = font_path
+    _font_path_resolved = True
+    return font_path
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def _load_font(font_path, font_size):
+    """按 (字体路径, 字号) 加载并缓存字体对象"""
+    if font_path is None:
+        # 如果没有可用字体，使用默认字体
+        return ImageFont.load_default()
+    return ImageFont.truetype(font_path, font_size)
+
+
+def get_font(font_size=None, font_path=None):
+    """
+    获取水印字体对象
+
+    Args:
+        font_size: 字体大小，为None时使用默认值
+        font_path: 字体文件路径，为None时使用进程内解析的字体
+
+    Returns:
+        ImageFont: 字体对象
+    """
+    font_size_val = font_size if font_size is not None else DEFAULT_FONT_SIZE
+    with profile_stage('font'):
+        if font_path is None:
+            font_path = resolve_font_path()
+        try:
+            return _load_font(font_path, font_size_val)
+        except (IOError, OSError) as e:
+            print(f"加载字体 '{font_path}' 时出错: {e}，使用默认字体")
+            return _load_font(None, font_size_val)
+
+
+def clear_font_cache():
+    """清空字体对象缓存并重新解析字体路径"""
+    global _font_path_resolved, _resolved_font_path
+    _load_font.cache_clear()
+    _font_path_resolved = False
+    _resolved_font_path = None
@@ -0,0 +1,116 @@
+import math
+import threading
+from contextlib import contextmanager
+from PIL import Image
+from .exif_utils import extract_exif_data
+from .profiling import profile_stage
+
+
+# Image.reduce 支持的图片模式，其他模式需先转换
+REDUCE_MODES = ('L', 'LA', 'I', 'F', 'RGB', 'RGBA', 'RGBa', 'CMYK', 'YCbCr')
+
+
+# 临时关闭Pillow解压炸弹检查时使用的锁，避免并发读取头信息时互相恢复错误的值
+_bomb_check_lock = threading.Lock()
+
+
+@contextmanager
+def open_image_header(image_path):
+    """
+    只读取图片头信息，不解码像素，并跳过Pillow的解压炸弹检查
+
+    用于在解码前读取尺寸和模式，超大图片也可以安全地打开。
+
+    Args:
+        image_path: 图片文件路径
+
+    Yields:
+        Image: 尚未解码的图片对象，退出时关闭文件
+    """
+    with _bomb_check_lock:
+        max_pixels = Image.MAX_IMAGE_PIXELS
+        Image.MAX_IMAGE_PIXELS = None
+        try:
+            image = Image.open(image_path)
+        finally:
+            Image.MAX_IMAGE_PIXELS = max_pixels
+    try:
+        yield image
+    finally:
+        image.close()
+
+
+def load_source_image(image_path, read_exif=True):
+    """
+    打开源图片一次，从同一文件句柄读取EXIF并解码像素
+
+    函数返回时像素已全部解码，文件句柄已确定性关闭，不会依赖垃圾回收释放。
+
+    Args:
+        image_path: 图片文件路径
+        read_exif: 是否读取EXIF信息
+
+    Returns:
+        tuple: (已解码的图片对象, EXIF信息字典)
+    """
+    with profile_stage('open'):
+        image = Image.open(image_path)
+    with image:
+        exif_data = {}
+        if read_exif:
+            try:
+                exif_data = extract_exif_data(image)
+            except Exception as e:
+                print(f"获取EXIF信息时出错: {e}")
+        # 在文件关闭前完成解码
+        with profile_stage('decode'):
+            image.load()
+    return image, exif_data
+
+
+def calculate_fit_size(image_size, target_size):
+    """
+    计算图片按比例缩放后完整放入目标区域时的尺寸
+
+    Args:
+        image_size: 原图尺寸 (width, height)
+        target_size: 目标区域尺寸 (width, height)
+
+    Returns:
+        tuple: 缩放后的尺寸 (width, height)，不会超过原图尺寸
+    """
+    width, height = image_size
+    target_width, target_height = target_size
+    scale = min(target_width / width, target_height / height, 1.0)
+    return max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale))
+
+
+def load_image_for_size(image_path, target_size):
+    """
+    按目标显示尺寸以降低的分辨率解码图片，用于预览和缩略图
+
+    JPEG使用DCT缩放（draft）在解码阶段直接缩小，其他格式解码后用reduce按整数倍缩小。
+    返回的代理图片是仍能覆盖目标显示尺寸的最小缩放版本，解码开销取决于屏幕尺寸而不是原图尺寸。
+
+    Args:
+        image_path: 图片文件路径
+        target_size: 图片按比例显示的区域尺寸 (width, height)
+
+    Returns:
+        tuple: (代理图片, 原图尺寸 (width, height))
+    """
+    with Image.open(image_path) as image:
+        original_size = image.size
+        fit_size = calculate_fit_size(original_size, target_size)
+        # JPEG在解码前选择能覆盖目标尺寸的最小DCT缩放比例，其他格式此调用无效果
+        image.draft(None, fit_size)
+        image.load()
+        proxy = image
+
+    # 对仍然大于目标尺寸两倍以上的图片按整数倍缩小
+    factor = min(proxy.width // fit_size[0], proxy.height // fit_size[1])
+    if factor > 1:
+        if proxy.mode not in REDUCE_MODES:
+            proxy = proxy.convert('RGBA')
+        proxy = proxy.reduce(factor)
+    return proxy, original_size
@@ -0,0 +1,172 @@
+import os
+import shutil
+from PIL import Image
+from .config import LARGE_IMAGE_PIXELS
+from .exif_utils import extract_exif_data, get_photo_date_or_today
+from .image_io import open_image_header
+from .profiling import profile_stage
+from .watermark_plan import composite_watermark_tile, paste_watermark_tile, _clip_tile_box
+
+
+# 支持按行带处理的源格式及对应的导出格式扩展名
+STRIP_FORMATS = {'BMP': ('bmp',), 'TIFF': ('tif', 'tiff')}
+
+# 支持按行带处理的图片模式，与完整解码时的合成方式一致
+STRIP_MODES = ('RGB', 'RGBA')
+
+
+def _raw_strips(image):
+    """
+    解析未压缩图片中每个行带在文件中的布局
+
+    Returns:
+        list: (起始行, 结束行, 文件偏移, rawmode, 行跨度, 行方向) 列表，
+              存在压缩或非整行的数据块时返回None
+    """
+    width = image.width
+    strips = []
+    for tile in image.tile:
+        codec, extents, offset, args = tile[0], tile[1], tile[2], tile[3]
+        if codec != 'raw' or not isinstance(args, tuple) or len(args) < 3:
+            return None
+        left, top, right, bottom = extents
+        if left != 0 or right != width:
+            return None
+        rawmode, stride, orientation = args[0], args[1], args[2]
+        try:
+            # 确认该rawmode可以写回，同时得到每个像素占用的字节数
+            pixel_bytes = len(Image.new(image.mode, (1, 1)).tobytes('raw', rawmode))
+        except ValueError:
+            return None
+        if not stride:
+            stride = width * pixel_bytes
+        strips.append((top, bottom, offset, rawmode, stride, orientation))
+    return strips
+
+
+def probe_strip_layout(image_path, extension=None):
+    """
+    判断图片是否适合按行带处理
+
+    只有超过LARGE_IMAGE_PIXELS像素、未压缩、导出格式与源格式相同的BMP和TIFF图片才按行带处理，
+    其余图片仍完整解码。
+
+    Args:
+        image_path: 图片文件路径
+        extension: 导出格式扩展名（小写，不带点号）
+
+    Returns:
+        tuple: (图片尺寸, 图片模式, 行带布局, EXIF信息字典)，不适合时返回None
+    """
+    # 未压缩的RGB图片每像素至少3字节，文件较小时无需读取头信息
+    if os.path.getsize(image_path) < LARGE_IMAGE_PIXELS * 3:
+        return None
+    with open_image_header(image_path) as image:
+        if extension not in STRIP_FORMATS.get(image.format, ()):
+            return None
+        if image.mode not in STRIP_MODES or getattr(image, 'n_frames', 1) != 1:
+            return None
+        if image.width * image.height < LARGE_IMAGE_PIXELS:
+            return None
+        strips = _raw_strips(image)
+        if not strips:
+            return None
+        try:
+            exif_data = extract_exif_data(image)
+        except Exception as e:
+            print(f"获取EXIF信息时出错: {e}")
+            exif_data = {}
+        return image.size, image.mode, strips, exif_data
+
+
+def _patch_strip_rows(f, strip, width, mode, top, bottom, tile, tile_position):
+    """
+    读取一个行带中与水印相交的行，混合水印后写回原位置
+
+    Args:
+        f: 以读写方式打开的输出文件
+        strip: 行带布局 (起始行, 结束行, 文件偏移, rawmode, 行跨度, 行方向)
+        width: 图片宽度
+        mode: 图片模式
+        top: 水印覆盖的起始行
+        bottom: 水印覆盖的结束行（不含）
+        tile: RGBA模式的水印图块
+        tile_position: 图块左上角在整张图片中的坐标
+    """
+    strip_top, strip_bottom, offset, rawmode, stride, orientation = strip
+    first = max(top, strip_top)
+    last = min(bottom, strip_bottom)
+    if last <= first:
+        return
+    rows = last - first
+
+    # 自下而上存储的行带中，越靠下的行越靠近数据起点
+    if orientation < 0:
+        start = offset + (strip_bottom - last) * stride
+    else:
+        start = offset + (first - strip_top) * stride
+    f.seek(start)
+    data = bytearray(f.read(rows * stride))
+    if len(data) != rows * stride:
+        raise ValueError("图片数据不完整")
+
+    band = Image.frombytes(mode, (width, rows), bytes(data), 'raw', rawmode, stride, orientation)
+    position = (tile_position[0], tile_position[1] - first)
+    if mode == 'RGBA':
+        composite_watermark_tile(band, tile, position)
+    else:
+        paste_watermark_tile(band, tile, position)
+
+    # 逐行写回像素，保留每行末尾的对齐填充字节
+    packed = band.tobytes('raw', rawmode)
+    row_bytes = len(packed) // rows
+    for i in range(rows):
+        row = rows - 1 - i if orientation < 0 else i
+        data[row * stride:row * stride + row_bytes] = packed[i * row_bytes:(i + 1) * row_bytes]
+    f.seek(start)
+    f.write(data)
+
+
+def write_watermarked_strips(image_path, output_path, plan, watermark_text=None, extension=None):
+    """
+    以行带方式为超大的未压缩图片添加水印
+
+    先原样复制源文件，再只读取、混合并写回与水印相交的行，其余数据不经过解码，
+    峰值内存只与水印高度和图片宽度有关。
+
+    Args:
+        image_path: 输入图片路径
+        output_path: 输出图片路径
+        plan: 预先编译的水印方案（WatermarkPlan）
+        watermark_text: 本张图片的水印文本，为None时依次使用方案文本和拍摄日期
+        extension: 导出格式扩展名（小写，不带点号）
+
+    Returns:
+        bool: 是否已按行带方式处理，为False时调用方应完整解码处理
+    """
+    layout = probe_strip_layout(image_path, extension)
+    if layout is None:
+        return False
+    size, mode, strips, exif_data = layout
+
+    text = plan.resolve_text(watermark_text)
+    if not text:
+        text = get_photo_date_or_today(exif_data, image_path)
+    with profile_stage('render'):
+        origin = plan.calculate_position(size[0], size[1], text)
+        tile, offset = plan.render_tile(text)
+    tile_position = (origin[0] + offset[0], origin[1] + offset[1])
+
+    with profile_stage('strips'):
+        shutil.copyfile(image_path, output_path)
+        box = _clip_tile_box(size, tile.size, tile_position)
+        if box is None:
+            # 水印完全落在图片之外
+            return True
+        (_, top), (_, source_top, _, source_bottom) = box
+        bottom = top + source_bottom - source_top
+
+        with open(output_path, 'r+b') as f:
+            for strip in strips:
+                _patch_strip_rows(f, strip, size[0], mode, top, bottom, tile, tile_position)
+    return True
@@ -0,0 +1,213 @@
+import os
+import json
+import hashlib
+from .config import MANIFEST_FILE_NAME
+from .exif_utils import get_fallback_date
+
+# 清单文件格式版本，格式不兼容时更新
+MANIFEST_VERSION = 1
+
+# 条目状态：清单中无记录、记录仍然有效、源文件或设置已变化
+ENTRY_NEW = 'new'
+ENTRY_UNCHANGED = 'unchanged'
+ENTRY_STALE = 'stale'
+
+
+def settings_fingerprint(plan, output_format=None, encoder_options=None):
+    """
+    计算水印设置的指纹，设置或导出格式变化时指纹随之变化
+
+    方案没有固定水印文本时，缺少拍摄日期的图片以当天日期作为水印，
+    因此指纹包含当天日期，日期变化后这些文件会重新处理。
+
+    Args:
+        plan: 预先编译的水印方案（WatermarkPlan）
+        output_format: 导出格式，为None时由输出文件扩展名决定
+        encoder_options: 编码参数，为None时使用Pillow默认值
+
+    Returns:
+        str: 十六进制的SHA-256摘要
+    """
+    payload = {
+        'version': MANIFEST_VERSION,
+        'settings': plan.settings(),
+        'output_format': output_format.lower() if output_format else None,
+    }
+    if plan.watermark_text is None:
+        payload['fallback_date'] = get_fallback_date()
+    # 未指定编码参数时指纹与之前的清单保持一致
+    if encoder_options:
+        payload['encoder_options'] = encoder_options
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def hash_file(file_path, block_size=1024 * 1024):
+    """
+    分块计算文件内容的SHA-256摘要
+
+    Args:
+        file_path: 文件路径
+        block_size: 每次读取的字节数
+
+    Returns:
+        str: 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ProcessingManifest:
+    """
+    增量处理清单，记录每个源文件上次成功处理时的大小、修改时间、
+    可选的内容摘要以及所用水印设置的指纹，保存在输出目录中
+
+    源文件大小和修改时间均未变化且设置指纹一致时视为无需重新处理；
+    启用内容摘要时，修改时间变化但内容相同的文件同样跳过。
+    """
+
+    def __init__(self, output_dir, fingerprint, use_hash=False):
+        """
+        Args:
+            output_dir: 输出目录，清单文件保存在其中
+            fingerprint: 本次处理所用设置的指纹
+            use_hash: 是否记录并比较源文件内容摘要
+        """
+        self.path = os.path.join(output_dir, MANIFEST_FILE_NAME)
+        self.fingerprint = fingerprint
+        self.use_hash = use_hash
+        self.entries = {}
+        # 本次处理中遍历到的条目键，用于清理已删除或重命名的源文件
+        self._seen = set()
+        self._dirty = False
+
+    def load(self):
+        """
+        读取已有的清单文件，文件不存在或格式不兼容时从空清单开始
+
+        Returns:
+            bool: 是否读取到有效的清单
+        """
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"读取处理清单时出错，将重新处理所有文件: {e}")
+            return False
+        if data.get('version') != MANIFEST_VERSION:
+            return False
+        self.entries = data.get('entries', {})
+        return True
+
+    def save(self):
+        """
+        将清单写入临时文件后原子替换，中途中断不会损坏已有清单
+
+        Returns:
+            bool: 是否保存成功
+        """
+        if not self._dirty:
+            return True
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(
+                    {'version': MANIFEST_VERSION, 'entries': self.entries},
+                    f,
+                    ensure_ascii=False,
+                    indent=1,
+                )
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            return True
+        except Exception as e:
+            print(f"保存处理清单时出错: {e}")
+            return False
+
+    def prune(self):
+        """
+        删除本次处理中未遍历到的条目（源文件已删除、重命名或被过滤）
+
+        只应在完整遍历输入目录之后调用。
+
+        Returns:
+            int: 删除的条目数量
+        """
+        removed = [key for key in self.entries if key not in self._seen]
+        for key in removed:
+            del self.entries[key]
+        if removed:
+            self._dirty = True
+        return len(removed)
+
+    def file_signature(self, file_path):
+        """
+        读取源文件的大小和纳秒级修改时间
+
+        Returns:
+            dict: 包含size和mtime_ns
+        """
+        stat = os.stat(file_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def check(self, key, file_path, output_file):
+        """
+        判断源文件相对清单记录的状态
+
+        Args:
+            key: 清单中的条目键（源文件相对输入目录的路径）
+            file_path: 源文件路径
+            output_file: 对应的输出文件路径
+
+        Returns:
+            tuple: (状态, 源文件签名)，状态为ENTRY_NEW、ENTRY_UNCHANGED或ENTRY_STALE
+        """
+        self._seen.add(key)
+        signature = self.file_signature(file_path)
+        entry = self.entries.get(key)
+        if entry is None:
+            return ENTRY_NEW, signature
+        if (
+            entry.get('fingerprint') != self.fingerprint
+            or entry.get('output') != os.path.basename(output_file)
+            or entry.get('size') != signature['size']
+            or not os.path.exists(output_file)
+        ):
+            return ENTRY_STALE, signature
+        if entry.get('mtime_ns') == signature['mtime_ns']:
+            # 之前未记录内容摘要的条目在本次补充记录
+            if self.use_hash and not entry.get('sha256'):
+                self.record(key, file_path, output_file, signature)
+            return ENTRY_UNCHANGED, signature
+        if not self.use_hash or not entry.get('sha256'):
+            return ENTRY_STALE, signature
+
+        # 修改时间变化但内容未变（如复制或重新同步的文件）时仍可跳过
+        signature['sha256'] = hash_file(file_path)
+        if signature['sha256'] != entry['sha256']:
+            return ENTRY_STALE, signature
+        self.record(key, file_path, output_file, signature)
+        return ENTRY_UNCHANGED, signature
+
+    def record(self, key, file_path, output_file, signature):
+        """
+        记录源文件已按当前设置成功处理
+
+        Args:
+            key: 清单中的条目键
+            file_path: 源文件路径
+            output_file: 对应的输出文件路径
+            signature: 处理前读取的源文件签名
+        """
+        entry = dict(signature)
+        if self.use_hash and 'sha256' not in entry:
+            entry['sha256'] = hash_file(file_path)
+        entry['fingerprint'] = self.fingerprint
+        entry['output'] = os.path.basename(output_file)
+        self.entries[key] = entry
+        self._dirty = True
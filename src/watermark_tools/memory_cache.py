@@ -0,0 +1,116 @@
+import threading
+from collections import OrderedDict
+
+
+class SizedLRUCache:
+    """
+    按内存占用限制容量的线程安全LRU缓存
+
+    每个条目的大小由sizeof函数估算，总大小超过上限时淘汰最久未使用的条目，
+    并统计命中、未命中和淘汰次数，便于根据实际任务调整缓存大小。
+    """
+
+    def __init__(self, max_bytes, sizeof):
+        """
+        Args:
+            max_bytes: 缓存总大小上限（字节），为0时不缓存任何条目
+            sizeof: 估算单个缓存值占用字节数的函数
+        """
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """
+        获取缓存值，命中时将条目标记为最近使用
+
+        Args:
+            key: 缓存键
+            default: 未命中时返回的值
+
+        Returns:
+            缓存值或default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """
+        写入缓存值，必要时淘汰最久未使用的条目
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+
+        Returns:
+            bool: 是否已缓存（单个值超过缓存上限时不缓存）
+        """
+        size = self._sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            if size > self.max_bytes:
+                return False
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            self._evict()
+            return True
+
+    def set_max_bytes(self, max_bytes):
+        """调整缓存大小上限，并立即淘汰超出的条目"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        """清空缓存并重置统计"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 包含hits、misses、evictions、entries、current_bytes、max_bytes
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'current_bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def _evict(self):
+        """淘汰最久未使用的条目直到总大小不超过上限（调用方需持有锁）"""
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
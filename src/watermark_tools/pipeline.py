@@ -0,0 +1,127 @@
+import queue
+import threading
+from .config import PIPELINE_QUEUE_SIZE
+
+
+# 队列中表示上游已全部完成的标记
+_END = object()
+
+# 线程等待队列时检查停止标志的间隔（秒）
+_POLL_INTERVAL = 0.1
+
+
+class StagedPipeline:
+    """
+    多阶段流水线：每个阶段由一组线程处理，阶段之间用有界队列连接
+
+    下游处理不过来时上游的put会阻塞，形成背压，在途任务数量不会超过各队列容量之和。
+    Pillow在文件读写和编解码时会释放GIL，因此I/O和编解码阶段可以与其他阶段并行执行。
+    各阶段按完成顺序向下游传递任务，结果也按完成顺序产出。
+    """
+
+    def __init__(self, stages, queue_size=PIPELINE_QUEUE_SIZE, on_error=None):
+        """
+        Args:
+            stages: (阶段名称, 处理函数, 线程数) 列表，处理函数接收任务并返回传给下一阶段的任务
+            queue_size: 阶段之间队列的容量
+            on_error: 处理函数抛出异常时调用的函数，参数为 (任务, 阶段名称, 异常)，
+                      返回值作为该任务继续传递；为None时异常任务被丢弃
+        """
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.on_error = on_error
+
+    def run(self, items):
+        """
+        运行流水线，按需从输入中读取任务
+
+        调用方提前停止迭代时，所有阶段线程会在当前任务完成后退出。
+
+        Args:
+            items: 任务的可迭代对象
+
+        Yields:
+            完成所有阶段的任务
+        """
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        stop = threading.Event()
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0], stop), daemon=True)]
+        for index, (name, func, workers) in enumerate(self.stages):
+            state = {'remaining': max(1, workers), 'lock': threading.Lock()}
+            for _ in range(state['remaining']):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(name, func, queues[index], queues[index + 1], state, stop),
+                    daemon=True,
+                ))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = _get(queues[-1], stop)
+                if item is _END:
+                    return
+                yield item
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _feed(self, items, output, stop):
+        """从输入中读取任务放入第一个队列"""
+        try:
+            for item in items:
+                if not _put(output, item, stop):
+                    return
+        except Exception as e:
+            print(f"读取任务时出错: {e}")
+        _put(output, _END, stop)
+
+    def _work(self, name, func, input_queue, output, state, stop):
+        """阶段线程：处理任务并传给下游，同一阶段的最后一个线程退出时通知下游"""
+        while True:
+            item = _get(input_queue, stop)
+            if item is _END:
+                # 放回结束标记，让同一阶段的其他线程也能退出
+                _put(input_queue, _END, stop)
+                break
+            try:
+                item = func(item)
+            except Exception as e:
+                if self.on_error is None:
+                    continue
+                item = self.on_error(item, name, e)
+            if not _put(output, item, stop):
+                return
+        with state['lock']:
+            state['remaining'] -= 1
+            last = state['remaining'] == 0
+        if last:
+            _put(output, _END, stop)
+
+
+def _get(q, stop):
+    """从队列取出任务，流水线停止时返回结束标记"""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            continue
+    return _END
+
+
+def _put(q, item, stop):
+    """
+    向队列放入任务，队列已满时等待
+
+    Returns:
+        bool: 是否放入成功，流水线停止时返回False
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+    return False
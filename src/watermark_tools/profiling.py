@@ -0,0 +1,267 @@
+import csv
+import json
+import threading
+import time
+from contextlib import nullcontext
+
+
+# 报告中各阶段的显示顺序，未列出的阶段排在最后
+STAGE_ORDER = (
+    'check', 'read', 'strips', 'open', 'exif', 'decode', 'font',
+    'convert', 'render', 'composite', 'encode', 'write',
+)
+
+# 报告中的百分位
+PROFILE_PERCENTILES = (50, 90, 99)
+
+# 是否启用阶段计时，未启用时各计时点只返回共享的空上下文
+_enabled = False
+
+# 当前线程正在记录的文件阶段耗时字典
+_local = threading.local()
+
+# 不属于任何文件的阶段耗时（如批处理开始前的字体加载）
+_setup_timings = {}
+_setup_lock = threading.Lock()
+
+_DISABLED_STAGE = nullcontext()
+
+
+def enable_profiling(enabled=True):
+    """
+    启用或关闭阶段计时
+
+    Args:
+        enabled: 是否启用
+    """
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def profiling_enabled():
+    """返回是否已启用阶段计时"""
+    return _enabled
+
+
+class _StageTimer:
+    """记录一个阶段的耗时，同一文件中同名阶段的耗时累加"""
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.start
+        timings = getattr(_local, 'timings', None)
+        if timings is None:
+            with _setup_lock:
+                _setup_timings[self.name] = _setup_timings.get(self.name, 0.0) + elapsed
+        else:
+            timings[self.name] = timings.get(self.name, 0.0) + elapsed
+        return False
+
+
+def profile_stage(name):
+    """
+    计时点：在with语句中记录一个阶段的耗时
+
+    未启用阶段计时时返回共享的空上下文，开销只有一次函数调用。
+
+    Args:
+        name: 阶段名称
+
+    Returns:
+        上下文管理器
+    """
+    if not _enabled:
+        return _DISABLED_STAGE
+    return _StageTimer(name)
+
+
+def start_file_profile(timings=None):
+    """
+    开始在当前线程中记录一个文件的各阶段耗时
+
+    Args:
+        timings: 记录到的字典，为None时新建
+
+    Returns:
+        dict: 记录各阶段耗时（秒）的字典，未启用阶段计时时返回None
+    """
+    if not _enabled:
+        return None
+    if timings is None:
+        timings = {}
+    _local.timings = timings
+    return timings
+
+
+def finish_file_profile():
+    """结束当前线程中的文件阶段计时"""
+    if _enabled:
+        _local.timings = None
+
+
+def get_setup_timings():
+    """
+    返回不属于任何文件的阶段耗时
+
+    Returns:
+        dict: 阶段名称到累计耗时（秒）的映射
+    """
+    with _setup_lock:
+        return dict(_setup_timings)
+
+
+def _percentile(sorted_values, percent):
+    """按线性插值计算已排序数据的百分位"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _ordered_stages(names):
+    """按STAGE_ORDER排列阶段名称"""
+    known = [name for name in STAGE_ORDER if name in names]
+    return known + sorted(name for name in names if name not in STAGE_ORDER and name != 'total')
+
+
+class ProfileReport:
+    """
+    汇总批处理中每个文件的阶段耗时，输出百分位统计并写入JSON或CSV报告
+    """
+
+    def __init__(self):
+        self.files = []
+
+    def add(self, file_path, timings, success=True):
+        """
+        记录一个文件的阶段耗时
+
+        Args:
+            file_path: 输入文件路径
+            timings: 阶段名称到耗时（秒）的字典，total为整个文件的耗时
+            success: 文件是否处理成功
+        """
+        self.files.append({'path': file_path, 'success': success, 'timings': dict(timings)})
+
+    def add_result(self, result):
+        """记录一个ExportResult"""
+        self.add(result.input_path, result.timings, result.success)
+
+    def stages(self):
+        """返回所有文件中出现过的阶段名称（不含total）"""
+        names = set()
+        for entry in self.files:
+            names.update(entry['timings'])
+        return _ordered_stages(names)
+
+    def summary(self):
+        """
+        计算各阶段的统计数据
+
+        total之外各阶段耗时之和与total的差值记为other，即未单独计时的部分。
+
+        Returns:
+            dict: 阶段名称到统计数据（count、sum、mean、p50、p90、p99、max、share）的映射
+        """
+        values = {}
+        for entry in self.files:
+            timings = entry['timings']
+            for name, seconds in timings.items():
+                values.setdefault(name, []).append(seconds)
+            if 'total' in timings:
+                other = timings['total'] - sum(
+                    seconds for name, seconds in timings.items() if name != 'total'
+                )
+                values.setdefault('other', []).append(max(0.0, other))
+
+        total_time = sum(values.get('total', [])) or sum(
+            sum(items) for name, items in values.items() if name != 'other'
+        )
+        summary = {}
+        for name in self.stages() + ['other', 'total']:
+            items = sorted(values.get(name, []))
+            if not items:
+                continue
+            stats = {
+                'count': len(items),
+                'sum': sum(items),
+                'mean': sum(items) / len(items),
+                'max': items[-1],
+                'share': sum(items) / total_time if total_time else 0.0,
+            }
+            for percent in PROFILE_PERCENTILES:
+                stats[f'p{percent}'] = _percentile(items, percent)
+            summary[name] = stats
+        return summary
+
+    def print_summary(self):
+        """打印各阶段耗时的百分位统计"""
+        summary = self.summary()
+        print(f"\n性能分析: 共 {len(self.files)} 个文件")
+        header = f"{'阶段':<10} {'文件数':>6} {'合计(s)':>9} {'占比':>7} {'平均(ms)':>9}"
+        for percent in PROFILE_PERCENTILES:
+            header += f" {f'p{percent}(ms)':>9}"
+        print(header + f" {'最大(ms)':>9}")
+        for name, stats in summary.items():
+            line = (
+                f"{name:<10} {stats['count']:>6} {stats['sum']:>9.3f} "
+                f"{stats['share'] * 100:>6.1f}% {stats['mean'] * 1000:>9.2f}"
+            )
+            for percent in PROFILE_PERCENTILES:
+                line += f" {stats[f'p{percent}'] * 1000:>9.2f}"
+            print(line + f" {stats['max'] * 1000:>9.2f}")
+        setup = get_setup_timings()
+        if setup:
+            items = ", ".join(f"{name} {seconds * 1000:.2f}ms" for name, seconds in setup.items())
+            print(f"批处理开始前的一次性开销: {items}")
+
+    def write(self, report_path):
+        """
+        写入报告，扩展名为.csv时每个文件一行，否则写入包含统计数据和每个文件耗时的JSON
+
+        Args:
+            report_path: 报告文件路径
+
+        Returns:
+            bool: 是否写入成功
+        """
+        try:
+            if report_path.lower().endswith('.csv'):
+                columns = self.stages() + ['total']
+                with open(report_path, 'w', newline='', encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(['path', 'success'] + columns)
+                    for entry in self.files:
+                        timings = entry['timings']
+                        writer.writerow(
+                            [entry['path'], int(entry['success'])]
+                            + [f"{timings[name]:.6f}" if name in timings else '' for name in columns]
+                        )
+            else:
+                with open(report_path, 'w', encoding='utf-8') as f:
+                    json.dump(
+                        {
+                            'summary': self.summary(),
+                            'setup': get_setup_timings(),
+                            'files': self.files,
+                        },
+                        f,
+                        ensure_ascii=False,
+                        indent=1,
+                    )
+            print(f"性能报告已写入: {report_path}")
+            return True
+        except Exception as e:
+            print(f"写入性能报告时出错: {e}")
+            return False
@@ -0,0 +1,42 @@
+from .config import STAMP_CACHE_SIZE_MB
+from .memory_cache import SizedLRUCache
+
+
+def _stamp_nbytes(stamp):
+    """估算水印图块 (RGBA图块, 偏移) 占用的字节数"""
+    tile, _ = stamp
+    return tile.width * tile.height * 4
+
+
+# 进程内共享的水印图块缓存，按 (文本, 字体, 字号, 颜色, 透明度) 缓存渲染好的RGBA图块
+_stamp_cache = SizedLRUCache(STAMP_CACHE_SIZE_MB * 1024 * 1024, _stamp_nbytes)
+
+
+def get_stamp_cache():
+    """获取进程内共享的水印图块缓存"""
+    return _stamp_cache
+
+
+def get_stamp_cache_stats():
+    """
+    获取水印图块缓存的命中统计
+
+    Returns:
+        dict: 包含hits、misses、evictions、entries、current_bytes、max_bytes
+    """
+    return _stamp_cache.stats()
+
+
+def set_stamp_cache_size(size_mb):
+    """
+    设置水印图块缓存的内存上限
+
+    Args:
+        size_mb: 缓存上限（MB），为0时禁用缓存
+    """
+    _stamp_cache.set_max_bytes(int(size_mb * 1024 * 1024))
+
+
+def clear_stamp_cache():
+    """清空水印图块缓存"""
+    _stamp_cache.clear()
@@ -0,0 +1,283 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+import time
+from PIL import Image
+from .config import THUMBNAIL_CACHE_DIR_NAME, THUMBNAIL_CACHE_SIZE_MB
+from .image_io import load_image_for_size
+
+# 缓存格式版本，缩略图生成方式变化时更新，旧条目自然失效并被淘汰
+THUMBNAIL_CACHE_VERSION = 1
+
+# 淘汰时删除到上限的这一比例，避免每次写入都触发淘汰
+_EVICT_TARGET_RATIO = 0.9
+
+# 写入中断（如进程被终止）遗留的临时文件超过这一时间（秒）后视为孤立文件并删除
+_TMP_GRACE_SECONDS = 60
+
+# PNG可以直接保存的图片模式，其他模式先转换为RGBA
+_PNG_MODES = ('1', 'L', 'LA', 'P', 'RGB', 'RGBA')
+
+
+def default_cache_dir():
+    """
+    获取当前用户的缩略图缓存目录
+
+    Windows使用%LOCALAPPDATA%，macOS使用~/Library/Caches，
+    其他系统使用$XDG_CACHE_HOME（默认~/.cache）。
+
+    Returns:
+        str: 缓存目录路径
+    """
+    if sys.platform.startswith('win'):
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, THUMBNAIL_CACHE_DIR_NAME, 'thumbnails')
+
+
+class ThumbnailCache:
+    """
+    保存在磁盘上的缩略图缓存，可由多个进程同时使用
+
+    缓存键由原图绝对路径、纳秒级修改时间、文件大小和缩略图尺寸计算，
+    原图被修改后键随之变化，读取缓存时只需stat原图而不必打开。
+    条目按键的前两位十六进制分片保存为PNG，先写入同目录的临时文件再原子替换，
+    其他进程不会读到写了一半的文件。命中时更新条目的修改时间，
+    总大小超过上限时按修改时间淘汰最久未使用的条目。
+    """
+
+    def __init__(self, cache_dir=None, max_size_mb=THUMBNAIL_CACHE_SIZE_MB):
+        """
+        Args:
+            cache_dir: 缓存目录，为None时使用default_cache_dir()
+            max_size_mb: 缓存总大小上限（MB），为0时不写入新条目
+        """
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        # 本进程估算的缓存总大小，首次写入时扫描目录得到，超过上限时重新扫描并淘汰
+        self._total_bytes = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, image_path, size):
+        """
+        计算原图在指定缩略图尺寸下的缓存键
+
+        Args:
+            image_path: 原图路径
+            size: 缩略图边长（像素）
+
+        Returns:
+            str: 十六进制的SHA-256摘要
+        """
+        abs_path = os.path.abspath(image_path)
+        stat = os.stat(abs_path)
+        payload = [THUMBNAIL_CACHE_VERSION, abs_path, stat.st_mtime_ns, stat.st_size, size]
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def entry_path(self, key):
+        """缓存键对应的条目文件路径"""
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def get(self, image_path, size):
+        """
+        读取缓存的缩略图
+
+        Args:
+            image_path: 原图路径
+            size: 缩略图边长（像素）
+
+        Returns:
+            Image: 已解码的缩略图，未命中或条目损坏时返回None
+        """
+        try:
+            path = self.entry_path(self.key(image_path, size))
+            with Image.open(path) as cached:
+                cached.load()
+                thumbnail = cached
+        except FileNotFoundError:
+            self._count_miss()
+            return None
+        except Exception as e:
+            print(f"读取缩略图缓存时出错: {e}")
+            self._count_miss()
+            return None
+        try:
+            # 更新修改时间作为最近使用时间，供淘汰时排序
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return thumbnail
+
+    def _count_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def put(self, image_path, size, thumbnail):
+        """
+        写入缩略图，必要时淘汰最久未使用的条目
+
+        Args:
+            image_path: 原图路径
+            size: 缩略图边长（像素）
+            thumbnail: 缩略图
+
+        Returns:
+            bool: 是否写入成功
+        """
+        if self.max_bytes <= 0:
+            return False
+        tmp_path = None
+        try:
+            path = self.entry_path(self.key(image_path, size))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if thumbnail.mode not in _PNG_MODES:
+                thumbnail = thumbnail.convert('RGBA')
+            # 临时文件名包含进程号和线程号，多个写入者互不覆盖
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            thumbnail.save(tmp_path, format='PNG', compress_level=1)
+            written = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"写入缩略图缓存时出错: {e}")
+            if tmp_path is not None and os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return False
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total()
+            else:
+                self._total_bytes += written
+            need_evict = self._total_bytes > self.max_bytes
+        if need_evict:
+            self.evict()
+        return True
+
+    def _iter_entries(self):
+        """
+        遍历所有条目，生成 (路径, 大小, 修改时间)，其他进程同时删除的条目被忽略
+
+        超过_TMP_GRACE_SECONDS的临时文件一并产出，计入缓存大小并在淘汰时删除；
+        更新的临时文件可能仍在写入，不产出。
+        """
+        tmp_deadline = time.time_ns() - _TMP_GRACE_SECONDS * 1_000_000_000
+        try:
+            shards = list(os.scandir(self.cache_dir))
+        except FileNotFoundError:
+            return
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            try:
+                entries = list(os.scandir(shard.path))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                is_tmp = entry.name.endswith('.tmp')
+                if not is_tmp and not entry.name.endswith('.png'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if is_tmp and stat.st_mtime_ns > tmp_deadline:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime_ns
+
+    def _scan_total(self):
+        """扫描目录得到缓存总大小"""
+        return sum(size for _, size, _ in self._iter_entries())
+
+    def evict(self, max_bytes=None):
+        """
+        删除孤立的临时文件，再按修改时间从旧到新删除条目，直到总大小不超过上限的90%
+
+        Args:
+            max_bytes: 本次使用的上限，为None时使用缓存的上限
+
+        Returns:
+            int: 删除的条目数
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._iter_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(limit * _EVICT_TARGET_RATIO)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= target and not path.endswith('.tmp'):
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                # 已被其他进程淘汰
+                pass
+            except OSError as e:
+                print(f"删除缩略图缓存时出错: {e}")
+                continue
+            total -= size
+        with self._lock:
+            self._total_bytes = total
+            self.evictions += removed
+        return removed
+
+    def clear(self):
+        """
+        删除所有条目
+
+        Returns:
+            int: 删除的条目数
+        """
+        return self.evict(0)
+
+    def stats(self):
+        """
+        获取缓存统计
+
+        Returns:
+            dict: 包含hits、misses、evictions、current_bytes、max_bytes
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'current_bytes': self._scan_total(),
+            'max_bytes': self.max_bytes,
+        }
+
+
+def load_thumbnail(image_path, size, cache=None):
+    """
+    获取图片的缩略图，优先从磁盘缓存读取，未命中时降低分辨率解码原图并写入缓存
+
+    Args:
+        image_path: 原图路径
+        size: 缩略图边长（像素）
+        cache: 缩略图缓存（ThumbnailCache），为None时不使用缓存
+
+    Returns:
+        Image: 不超过 size×size 的缩略图
+    """
+    if cache is not None:
+        thumbnail = cache.get(image_path, size)
+        if thumbnail is not None:
+            return thumbnail
+    # 按缩略图尺寸降低分辨率解码，避免完整解码原图
+    thumbnail, _ = load_image_for_size(image_path, (size, size))
+    thumbnail.thumbnail((size, size))
+    if cache is not None:
+        cache.put(image_path, size, thumbnail)
+    return thumbnail
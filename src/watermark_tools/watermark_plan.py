@@ -0,0 +1,425 @@
+from PIL import Image, ImageColor, ImageDraw
+from .config import DEFAULT_FONT_SIZE, DEFAULT_WATERMARK_POSITION, DEFAULT_WATERMARK_COLOR
+from .font_manager import get_font
+from .stamp_cache import get_stamp_cache
+from .profiling import profile_stage
+
+
+# 预设位置距离图片边缘的像素边距
+WATERMARK_MARGIN = 10
+
+# 支持的预设位置
+PRESET_POSITIONS = ('top-left', 'top-right', 'center', 'bottom-left', 'bottom-right')
+
+
+def build_alpha_lut(transparency):
+    """
+    根据透明度生成256级alpha查找表
+
+    Args:
+        transparency: 水印透明度 (0-100)，100代表完全透明
+
+    Returns:
+        list: alpha查找表，alpha为0的像素保持为0
+    """
+    # 确保透明度在有效范围内
+    transparency_val = max(0, min(100, transparency))
+    # 计算透明度因子（100代表完全透明，0代表完全不透明）
+    alpha_factor = (100 - transparency_val) / 100.0
+    return [int(a * alpha_factor) for a in range(256)]
+
+
+def apply_watermark_transparency(watermark_layer, transparency):
+    """
+    按透明度整体缩放水印图层的alpha通道
+
+    使用查找表对alpha通道做一次波段运算，代替逐像素的getpixel/putpixel循环，
+    结果与逐像素计算 int(a * alpha_factor) 完全一致。
+
+    Args:
+        watermark_layer: RGBA模式的水印图层
+        transparency: 水印透明度 (0-100)，100代表完全透明
+
+    Returns:
+        Image: 调整透明度后的新RGBA图层
+    """
+    return _apply_alpha_lut(watermark_layer, build_alpha_lut(transparency))
+
+
+def _apply_alpha_lut(watermark_layer, alpha_lut):
+    """用查找表替换RGBA图层的alpha通道"""
+    r, g, b, a = watermark_layer.split()
+    return Image.merge('RGBA', (r, g, b, a.point(alpha_lut)))
+
+
+def parse_watermark_color(color):
+    """
+    将水印颜色解析为RGB元组
+
+    Args:
+        color: 十六进制颜色码、颜色名称或RGB(A)元组/列表，为None时使用默认颜色
+
+    Returns:
+        tuple: RGB颜色元组（不含alpha通道）
+    """
+    color_val = color if color is not None else DEFAULT_WATERMARK_COLOR
+
+    # 处理颜色格式，支持十六进制颜色码转RGB
+    if isinstance(color_val, str) and color_val.startswith('#'):
+        # 移除#号
+        color_hex = color_val.lstrip('#')
+        # 将十六进制颜色码转换为RGB元组
+        try:
+            r = int(color_hex[0:2], 16)
+            g = int(color_hex[2:4], 16)
+            b = int(color_hex[4:6], 16)
+            color_val = (r, g, b)
+        except ValueError:
+            # 如果转换失败，使用默认颜色
+            color_val = DEFAULT_WATERMARK_COLOR
+    elif isinstance(color_val, str):
+        # 颜色名称，如 white、red
+        try:
+            color_val = ImageColor.getrgb(color_val)
+        except ValueError:
+            print(f"警告: 无法识别的水印颜色 '{color_val}'，使用默认颜色")
+            color_val = DEFAULT_WATERMARK_COLOR
+
+    # 确保color_val是RGB元组（不含alpha通道）
+    return tuple(color_val)[:3]
+
+
+def normalize_watermark_position(position):
+    """
+    将水印位置参数规范化为与图片尺寸无关的位置规则
+
+    Args:
+        position: top-left, top-right, center, bottom-left, bottom-right 或 (rel_x, rel_y) 相对坐标元组
+
+    Returns:
+        tuple: ('relative', rel_x, rel_y)、('preset', 位置名) 或 ('fixed', x, y)
+    """
+    if isinstance(position, tuple) and len(position) == 2 and all(isinstance(p, float) for p in position):
+        # 相对坐标，确保坐标在有效范围内 (0-1)
+        rel_x, rel_y = position
+        return ('relative', max(0, min(1, rel_x)), max(0, min(1, rel_y)))
+    if position is None:
+        return ('preset', 'top-left')
+    if isinstance(position, str) and position.lower() in PRESET_POSITIONS:
+        return ('preset', position.lower())
+    # 默认左上角
+    return ('fixed',) + tuple(DEFAULT_WATERMARK_POSITION)
+
+
+class WatermarkPlan:
+    """
+    预先编译的水印方案
+
+    将与具体图片无关的工作（颜色解析、字体加载、透明度查找表、位置规则以及文本尺寸测量）
+    只做一次，之后对每张图片只需计算最终像素位置并完成混合。同一方案可在整个批处理、
+    命令行以及GUI预览中重复使用。
+    """
+
+    def __init__(
+        self,
+        watermark_text=None,
+        position=None,
+        font_size=None,
+        color=None,
+        transparency=None,
+        font_path=None,
+        margin=WATERMARK_MARGIN,
+    ):
+        """
+        Args:
+            watermark_text: 默认水印文本，为None时需在应用时逐张提供（如EXIF拍摄日期）
+            position: 水印位置，可选值: top-left, top-right, center, bottom-left, bottom-right 或 (rel_x, rel_y) 相对坐标元组
+            font_size: 字体大小
+            color: 水印颜色
+            transparency: 水印透明度 (0-100)，100代表完全透明
+            font_path: 字体文件路径，为None时使用进程内解析的字体
+            margin: 预设位置距离图片边缘的像素边距
+        """
+        self.watermark_text = watermark_text
+        self.position = position
+        self.position_rule = normalize_watermark_position(position)
+        self.font_size = font_size if font_size is not None else DEFAULT_FONT_SIZE
+        self.font = get_font(self.font_size, font_path)
+        # Pillow内置默认字体没有文件路径，统一记为None
+        font_file = getattr(self.font, 'path', None)
+        self.font_path = font_file if isinstance(font_file, str) else None
+        self.color = parse_watermark_color(color)
+        self.transparency = None if transparency is None else max(0, min(100, transparency))
+        self.alpha_lut = None if transparency is None else build_alpha_lut(transparency)
+        self.margin = margin
+        # 用于测量文本尺寸的绘图对象，以及按文本缓存的边界框
+        self._measure_draw = ImageDraw.Draw(Image.new('RGBA', (1, 1), (0, 0, 0, 0)))
+        self._text_bboxes = {}
+
+    def settings(self):
+        """
+        返回可序列化的方案参数，用于在其他进程中重建相同的方案
+
+        Returns:
+            dict: 可直接传给 WatermarkPlan(**settings) 的参数
+        """
+        return {
+            'watermark_text': self.watermark_text,
+            'position': self.position,
+            'font_size': self.font_size,
+            'color': self.color,
+            'transparency': self.transparency,
+            'font_path': self.font_path,
+            'margin': self.margin,
+        }
+
+    def resolve_text(self, watermark_text=None):
+        """返回本次实际使用的水印文本"""
+        return watermark_text if watermark_text is not None else self.watermark_text
+
+    def get_text_bbox(self, watermark_text=None):
+        """
+        获取水印文本相对绘制原点的边界框
+
+        Args:
+            watermark_text: 水印文本，为None时使用方案的默认文本
+
+        Returns:
+            tuple: (left, top, right, bottom)
+        """
+        text = self.resolve_text(watermark_text)
+        bbox = self._text_bboxes.get(text)
+        if bbox is None:
+            bbox = self._measure_draw.textbbox((0, 0), text, font=self.font)
+            self._text_bboxes[text] = bbox
+        return bbox
+
+    def calculate_position(self, width, height, watermark_text=None, position=None):
+        """
+        计算水印文字在指定尺寸图片上的绘制原点
+
+        Args:
+            width: 图片宽度
+            height: 图片高度
+            watermark_text: 水印文本，为None时使用方案的默认文本
+            position: 代替方案中位置的水印位置（如拖拽中的相对坐标），为None时使用方案中的位置
+
+        Returns:
+            tuple: 绘制原点像素坐标 (x, y)
+        """
+        bbox = self.get_text_bbox(watermark_text)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        margin = self.margin
+        position_rule = self.position_rule if position is None else normalize_watermark_position(position)
+
+        kind = position_rule[0]
+        if kind == 'relative':
+            _, rel_x, rel_y = position_rule
+            # 计算实际像素位置（考虑文本大小，使文本中心位于指定坐标）
+            x = int(rel_x * width - text_width / 2)
+            y = int(rel_y * height - text_height / 2)
+            # 确保位置在图片范围内
+            x = max(0, min(x, width - text_width))
+            y = max(0, min(y, height - text_height))
+            return (x, y)
+        if kind == 'fixed':
+            return position_rule[1:]
+
+        preset = position_rule[1]
+        if preset == 'top-right':
+            return (width - text_width - margin, margin)
+        if preset == 'center':
+            return ((width - text_width) // 2, (height - text_height) // 2)
+        if preset == 'bottom-left':
+            return (margin, height - text_height - margin)
+        if preset == 'bottom-right':
+            return (width - text_width - margin, height - text_height - margin)
+        # 左上角
+        return (margin, margin)
+
+    def scaled(self, scale):
+        """
+        生成按比例缩放字号、边距和固定位置的水印方案，用于在缩小的代理图片上预览
+
+        Args:
+            scale: 代理图片相对原图的缩放比例
+
+        Returns:
+            WatermarkPlan: 缩放后的水印方案，scale为1时返回自身
+        """
+        if scale == 1:
+            return self
+        plan = WatermarkPlan(
+            watermark_text=self.watermark_text,
+            position=self.position,
+            font_size=max(1, round(self.font_size * scale)),
+            color=self.color,
+            transparency=self.transparency,
+            font_path=self.font_path,
+            margin=max(0, round(self.margin * scale)),
+        )
+        if self.position_rule[0] == 'fixed':
+            _, x, y = self.position_rule
+            plan.position_rule = ('fixed', round(x * scale), round(y * scale))
+        return plan
+
+    def stamp_key(self, watermark_text=None):
+        """返回水印图块在缓存中的键 (文本, 字体, 字号, 颜色, 透明度)"""
+        return (
+            self.resolve_text(watermark_text),
+            self.font_path,
+            self.font_size,
+            self.color,
+            self.transparency,
+        )
+
+    def render_tile(self, watermark_text=None):
+        """
+        获取渲染好的水印图块，优先从进程内的图块缓存中读取
+
+        缓存中的图块会被多张图片共享，调用方不应修改返回的图块。
+
+        Args:
+            watermark_text: 水印文本，为None时使用方案的默认文本
+
+        Returns:
+            tuple: (图块, (offset_x, offset_y))，offset为文字绘制原点到图块左上角的偏移
+        """
+        stamp_cache = get_stamp_cache()
+        key = self.stamp_key(watermark_text)
+        stamp = stamp_cache.get(key)
+        if stamp is None:
+            stamp = self._rasterize_tile(watermark_text)
+            stamp_cache.put(key, stamp)
+        return stamp
+
+    def _rasterize_tile(self, watermark_text=None):
+        """将水印文字渲染到与其边界框等大的RGBA图块上，并应用透明度"""
+        text = self.resolve_text(watermark_text)
+        bbox = self.get_text_bbox(text)
+        tile_width = max(0, bbox[2] - bbox[0])
+        tile_height = max(0, bbox[3] - bbox[1])
+
+        # 平移绘制原点，使文字墨迹恰好落在图块内
+        tile = Image.new('RGBA', (tile_width, tile_height), (0, 0, 0, 0))
+        ImageDraw.Draw(tile).text((-bbox[0], -bbox[1]), text, font=self.font, fill=self.color)
+        if self.alpha_lut is not None:
+            tile = _apply_alpha_lut(tile, self.alpha_lut)
+        return tile, (bbox[0], bbox[1])
+
+    def apply(self, image, watermark_text=None):
+        """
+        将水印混合到图片上（原地修改）
+
+        RGBA图片使用alpha合成；RGB等不透明图片以水印alpha为蒙版直接粘贴，
+        不需要转换为RGBA。
+
+        Args:
+            image: RGBA或RGB模式的图片
+            watermark_text: 水印文本，为None时使用方案的默认文本
+
+        Returns:
+            Image: 添加水印后的图片
+        """
+        width, height = image.size
+        with profile_stage('render'):
+            origin = self.calculate_position(width, height, watermark_text)
+            tile, offset = self.render_tile(watermark_text)
+        tile_position = (origin[0] + offset[0], origin[1] + offset[1])
+        with profile_stage('composite'):
+            if image.mode == 'RGBA':
+                return composite_watermark_tile(image, tile, tile_position)
+            return paste_watermark_tile(image, tile, tile_position)
+
+
+def compile_watermark_plan(
+    watermark_text=None,
+    position=None,
+    font_size=None,
+    color=None,
+    transparency=None,
+    font_path=None,
+):
+    """
+    编译水印方案，供批量处理、命令行和GUI预览重复使用
+
+    Args:
+        watermark_text: 默认水印文本，为None时需在应用时逐张提供
+        position: 水印位置
+        font_size: 字体大小
+        color: 水印颜色
+        transparency: 水印透明度 (0-100)
+        font_path: 字体文件路径
+
+    Returns:
+        WatermarkPlan: 编译后的水印方案
+    """
+    return WatermarkPlan(
+        watermark_text=watermark_text,
+        position=position,
+        font_size=font_size,
+        color=color,
+        transparency=transparency,
+        font_path=font_path,
+    )
+
+
+def _clip_tile_box(image_size, tile_size, position):
+    """
+    计算水印图块与图片相交的区域
+
+    Returns:
+        tuple: (目标左上角 (left, top), 图块中的源区域 (l, t, r, b))，不相交时返回None
+    """
+    x, y = position
+    left = max(0, x)
+    top = max(0, y)
+    right = min(image_size[0], x + tile_size[0])
+    bottom = min(image_size[1], y + tile_size[1])
+    if right <= left or bottom <= top:
+        # 水印完全落在图片之外
+        return None
+    return (left, top), (left - x, top - y, right - x, bottom - y)
+
+
+def composite_watermark_tile(image, tile, position):
+    """
+    将水印图块混合到RGBA图片的对应区域（原地修改），超出图片的部分会被裁剪
+
+    Args:
+        image: RGBA模式的目标图片
+        tile: RGBA模式的水印图块
+        position: 图块左上角在目标图片中的像素坐标 (x, y)，允许为负数
+
+    Returns:
+        Image: 混合后的目标图片
+    """
+    box = _clip_tile_box(image.size, tile.size, position)
+    if box is None:
+        return image
+    dest, source = box
+    image.alpha_composite(tile, dest=dest, source=source)
+    return image
+
+
+def paste_watermark_tile(image, tile, position):
+    """
+    以水印图块的alpha通道为蒙版，将其粘贴到不透明图片的对应区域（原地修改）
+
+    Args:
+        image: RGB或L模式的目标图片
+        tile: RGBA模式的水印图块
+        position: 图块左上角在目标图片中的像素坐标 (x, y)，允许为负数
+
+    Returns:
+        Image: 混合后的目标图片
+    """
+    box = _clip_tile_box(image.size, tile.size, position)
+    if box is None:
+        return image
+    dest, source = box
+    if source != (0, 0, tile.width, tile.height):
+        tile = tile.crop(source)
+    image.paste(tile.convert(image.mode), dest, mask=tile.getchannel('A'))
+    return image
@@ -1,171 +1,319 @@
+import io
 import os
-from PIL import Image, ImageDraw, ImageFont
-from .config import DEFAULT_FONT_SIZE, DEFAULT_WATERMARK_POSITION, DEFAULT_WATERMARK_COLOR
+from PIL import Image
+from .watermark_plan import compile_watermark_plan
+from .image_io import load_source_image
+from .exif_utils import get_photo_date_or_today
+from .large_image import write_watermarked_strips
+from .config import ENCODER_PRESETS, DEFAULT_ENCODER_PRESET
+from .profiling import profile_stage, profiling_enabled
 
 
-import re
-import os
+# 不能保存alpha通道的导出格式
+OPAQUE_OUTPUT_FORMATS = ('jpg', 'jpeg')
+
+
+def image_has_alpha(image):
+    """
+    判断图片是否带有透明信息
+
+    Args:
+        image: PIL图片对象
+
+    Returns:
+        bool: 是否带有alpha通道或透明色
+    """
+    return image.mode in ('RGBA', 'RGBa', 'LA', 'La', 'PA') or 'transparency' in image.info
+
+
+def watermark_image(image, watermark_text=None, plan=None, in_place=False):
+    """
+    在内存中的图片上添加水印
 
-def add_watermark_to_image(image_path, watermark_text, output_path, position=None, font_size=None, color=None, transparency=None, extension=None):
+    只有源图片带有透明信息时才转换为RGBA进行alpha合成；RGB、L等不透明图片
+    在RGB模式下以水印alpha为蒙版直接粘贴，避免RGBA往返转换，结果与alpha合成一致。
+
+    Args:
+        image: 已解码的PIL图片对象
+        watermark_text: 水印文本，为None时使用方案中的默认文本
+        plan: 预先编译的水印方案（WatermarkPlan）
+        in_place: 源图片已是目标模式时是否直接在其上修改，为False时会先复制
+
+    Returns:
+        Image: 添加水印后的图片（RGBA或RGB模式）
+    """
+    if plan is None:
+        plan = compile_watermark_plan(watermark_text)
+
+    target_mode = 'RGBA' if image_has_alpha(image) else 'RGB'
+    with profile_stage('convert'):
+        if image.mode != target_mode:
+            image = image.convert(target_mode)
+        elif not in_place:
+            image = image.copy()
+    # 只在文本边界框大小的图块上绘制水印，并仅混合到原图中水印覆盖的区域
+    return plan.apply(image, watermark_text)
+
+
+def convert_for_export(result, output_format):
+    """
+    按导出格式转换图片模式，JPEG不支持透明度，转换为RGB模式
+
+    Args:
+        result: 添加水印后的图片
+        output_format: 小写且不带点号的格式扩展名
+
+    Returns:
+        Image: 与导出文件模式一致的图片，无需转换时返回原图片
+    """
+    if output_format in OPAQUE_OUTPUT_FORMATS and result.mode != 'RGB':
+        return result.convert('RGB')
+    return result
+
+
+def watermark_preview(proxy, original_size, plan, extension=None):
+    """
+    在内存中生成水印预览，不经过编码和文件读写
+
+    水印方案按代理图片相对原图的缩放比例缩放，图片模式按导出格式转换，
+    预览中的水印位置、大小和透明效果与导出结果一致。
+
+    Args:
+        proxy: 按预览尺寸解码的代理图片（见load_image_for_size），不会被修改
+        original_size: 原图尺寸 (width, height)
+        plan: 原图尺寸下的水印方案（WatermarkPlan）
+        extension: 导出格式扩展名（如 'jpg', 'png'），为None时保持水印合成后的模式
+
+    Returns:
+        Image: 添加水印后的预览图片
+    """
+    plan = plan.scaled(proxy.width / original_size[0])
+    result = watermark_image(proxy, None, plan)
+    if extension:
+        result = convert_for_export(result, extension.lower())
+    return result
+
+
+def resolve_output_format(output_path, extension=None):
+    """
+    确定导出格式
+
+    Args:
+        output_path: 输出图片路径
+        extension: 导出格式扩展名（如 'jpg', 'png'），优先使用此参数
+
+    Returns:
+        str: 小写且不带点号的格式扩展名
+    """
+    # 优先使用传入的extension参数，如果没有则从文件路径获取
+    if extension:
+        return extension.lower()
+    # 从文件路径获取扩展名并转换为小写
+    _, output_format = os.path.splitext(output_path)
+    output_format = output_format.lower()
+    # 去除可能的点号前缀
+    if output_format.startswith('.'):
+        output_format = output_format[1:]
+    return output_format
+
+
+def get_encoder_options(preset=None, **overrides):
+    """
+    生成导出时的编码参数
+
+    Args:
+        preset: 编码预设名称（fast、balanced、smallest），为None时使用DEFAULT_ENCODER_PRESET
+        **overrides: 覆盖预设的单项参数，值为None的项保持预设值，可选:
+            jpeg_quality: JPEG质量 (1-95)
+            jpeg_subsampling: JPEG色度抽样 ('4:4:4', '4:2:2', '4:2:0')
+            jpeg_progressive: 是否生成渐进式JPEG
+            jpeg_optimize: 是否优化JPEG哈夫曼表（体积更小，编码更慢）
+            png_compress_level: PNG的zlib压缩级别 (0-9)，越小越快
+            png_optimize: 是否以最高压缩级别优化PNG
+
+    Returns:
+        dict: 编码参数
+    """
+    preset = preset or DEFAULT_ENCODER_PRESET
+    if preset not in ENCODER_PRESETS:
+        raise ValueError(f"未知的编码预设 '{preset}'，可选: {', '.join(ENCODER_PRESETS)}")
+    options = dict(ENCODER_PRESETS[preset])
+    for key, value in overrides.items():
+        if key not in options:
+            raise ValueError(f"未知的编码参数 '{key}'")
+        if value is not None:
+            options[key] = value
+    return options
+
+
+def _encoder_save_params(output_format, encoder_options):
+    """将编码参数转换为对应格式的Pillow保存参数，未提供编码参数时使用Pillow默认值"""
+    if not encoder_options:
+        return {}
+    if output_format in OPAQUE_OUTPUT_FORMATS:
+        params = {
+            'quality': encoder_options.get('jpeg_quality'),
+            'subsampling': encoder_options.get('jpeg_subsampling'),
+            'progressive': encoder_options.get('jpeg_progressive'),
+            'optimize': encoder_options.get('jpeg_optimize'),
+        }
+    elif output_format == 'png':
+        params = {
+            'compress_level': encoder_options.get('png_compress_level'),
+            'optimize': encoder_options.get('png_optimize'),
+        }
+    else:
+        return {}
+    return {key: value for key, value in params.items() if value is not None}
+
+
+def _save_image(result, target, output_format, encoder_options=None):
+    """按导出格式将图片写入文件路径或文件对象"""
+    params = _encoder_save_params(output_format, encoder_options)
+    # 检查是否为JPEG格式，如果是则转换为RGB模式
+    if output_format in OPAQUE_OUTPUT_FORMATS:
+        # JPEG不支持透明度，需要转换为RGB模式
+        result = convert_for_export(result, output_format)
+        result.save(target, 'JPEG', **params)
+    elif output_format == 'png':
+        # PNG支持透明度，保持图片原有模式
+        result.save(target, 'PNG', **params)
+    else:
+        # 其他格式按扩展名确定编码器
+        format_name = Image.registered_extensions().get(f".{output_format}")
+        if format_name is None:
+            raise ValueError(f"unknown file extension: .{output_format}")
+        result.save(target, format_name)
+
+
+def save_watermarked_image(result, output_path, extension=None, encoder_options=None):
+    """
+    按导出格式保存添加水印后的图片
+
+    Args:
+        result: 添加水印后的图片
+        output_path: 输出图片路径
+        extension: 导出格式扩展名（如 'jpg', 'png'），优先使用此参数
+        encoder_options: 编码参数（见get_encoder_options），为None时使用Pillow默认值
+    """
+    output_format = resolve_output_format(output_path, extension)
+    if profiling_enabled():
+        # 性能分析时先编码到内存再写入文件，以便分别统计编码和写入耗时
+        data = encode_watermarked_image(result, output_path, extension, encoder_options)
+        with profile_stage('write'):
+            with open(output_path, 'wb') as f:
+                f.write(data)
+        return
+    _save_image(result, output_path, output_format, encoder_options)
+
+
+def encode_watermarked_image(result, output_path, extension=None, encoder_options=None):
+    """
+    按导出格式将添加水印后的图片编码为字节串，编码规则与save_watermarked_image一致
+
+    Args:
+        result: 添加水印后的图片
+        output_path: 输出图片路径，用于确定导出格式
+        extension: 导出格式扩展名（如 'jpg', 'png'），优先使用此参数
+        encoder_options: 编码参数（见get_encoder_options），为None时使用Pillow默认值
+
+    Returns:
+        bytes: 编码后的图片数据
+    """
+    output_format = resolve_output_format(output_path, extension)
+    buffer = io.BytesIO()
+    with profile_stage('encode'):
+        _save_image(result, buffer, output_format, encoder_options)
+    return buffer.getvalue()
+
+
+def write_watermarked_file(image_path, output_path, plan, watermark_text=None, extension=None, encoder_options=None):
+    """
+    为单个图片文件添加水印并保存，源文件只打开一次，出错时抛出异常
+
+    需要拍摄日期作为水印时，EXIF从解码像素所用的同一文件句柄中读取，
+    文件在解码完成后即被关闭。超大的未压缩BMP和TIFF图片按行带处理，见large_image模块。
+
+    Args:
+        image_path: 输入图片路径
+        output_path: 输出图片路径
+        plan: 预先编译的水印方案（WatermarkPlan）
+        watermark_text: 本张图片的水印文本，为None时依次使用方案文本和拍摄日期
+        extension: 导出格式扩展名（如 'jpg', 'png'），优先使用此参数
+        encoder_options: 编码参数（见get_encoder_options），为None时使用Pillow默认值
+    """
+    # 超大的未压缩BMP和TIFF图片只处理与水印相交的行，不完整解码
+    if write_watermarked_strips(
+        image_path, output_path, plan, watermark_text,
+        resolve_output_format(output_path, extension),
+    ):
+        return
+
+    text = plan.resolve_text(watermark_text)
+    # 只有需要拍摄日期作为水印时才读取EXIF
+    image, exif_data = load_source_image(image_path, read_exif=not text)
+    if not text:
+        text = get_photo_date_or_today(exif_data, image_path)
+
+    # 解码得到的图片只在此处使用，直接在其上混合水印
+    result = watermark_image(image, text, plan, in_place=True)
+    save_watermarked_image(result, output_path, extension, encoder_options)
+
+
+def watermark_file(image_path, output_path, plan, watermark_text=None, extension=None, encoder_options=None):
+    """
+    为单个图片文件添加水印并保存，源文件只打开一次
+
+    Args:
+        image_path: 输入图片路径
+        output_path: 输出图片路径
+        plan: 预先编译的水印方案（WatermarkPlan）
+        watermark_text: 本张图片的水印文本，为None时依次使用方案文本和拍摄日期
+        extension: 导出格式扩展名（如 'jpg', 'png'），优先使用此参数
+        encoder_options: 编码参数（见get_encoder_options），为None时使用Pillow默认值
+
+    Returns:
+        bool: 是否成功添加水印
+    """
+    try:
+        write_watermarked_file(
+            image_path, output_path, plan, watermark_text, extension, encoder_options
+        )
+        print(f"已成功添加水印并保存到: {output_path}")
+        return True
+    except Exception as e:
+        print(f"添加水印时出错: {e}")
+        return False
+
+
+def add_watermark_to_image(image_path, watermark_text, output_path, position=None, font_size=None, color=None, transparency=None, extension=None, plan=None, encoder_options=None):
     """
     在图片上添加水印
     
     Args:
         image_path: 输入图片路径
-        watermark_text: 水印文本
+        watermark_text: 水印文本，为None时使用方案中的默认文本，仍为空则使用拍摄日期
         output_path: 输出图片路径
         position: 水印位置，可选值: top-left, center, bottom-right 或 (rel_x, rel_y) 相对坐标元组
         font_size: 字体大小
         color: 水印颜色
         transparency: 水印透明度 (0-100)，100代表完全透明
         extension: 导出格式扩展名（如 'jpg', 'png'），优先使用此参数
+        plan: 预先编译的水印方案（WatermarkPlan），提供时忽略position、font_size、color和transparency
+        encoder_options: 编码参数（见get_encoder_options），为None时使用Pillow默认值
         
     Returns:
         bool: 是否成功添加水印
     """
     try:
-        # 打开图片
-        image = Image.open(image_path).convert('RGBA')
-        width, height = image.size
-        
-        # 设置字体大小，使用传入的值或默认值
-        font_size_val = font_size if font_size is not None else DEFAULT_FONT_SIZE
-        
-        # 设置字体，尝试使用系统字体或默认字体
-        try:
-            # 尝试使用中文字体 - 根据操作系统尝试不同的字体路径
-            if os.name == 'nt':  # Windows
-                font = ImageFont.truetype("simhei.ttf", font_size_val)
-            else:  # macOS/Linux
-                font = ImageFont.truetype("WenQuanYi Micro Hei", font_size_val)
-        except IOError:
-            try:
-                # 尝试其他常见中文字体
-                font = ImageFont.truetype("Arial Unicode MS", font_size_val)
-            except IOError:
-                # 如果没有指定字体，使用默认字体
-                font = ImageFont.load_default()
-        
-        # 设置水印颜色，使用传入的值或默认值
-        color_val = color if color is not None else DEFAULT_WATERMARK_COLOR
-        
-        # 处理颜色格式，支持十六进制颜色码转RGB
-        if isinstance(color_val, str) and color_val.startswith('#'):
-            # 移除#号
-            color_hex = color_val.lstrip('#')
-            # 将十六进制颜色码转换为RGB元组
-            try:
-                r = int(color_hex[0:2], 16)
-                g = int(color_hex[2:4], 16)
-                b = int(color_hex[4:6], 16)
-                color_val = (r, g, b)
-            except ValueError:
-                # 如果转换失败，使用默认颜色
-                color_val = DEFAULT_WATERMARK_COLOR
-        
-        # 确保color_val是RGB元组（不含alpha通道）
-        if isinstance(color_val, tuple) and len(color_val) == 4:
-            color_val = color_val[:3]  # 只保留RGB部分
-        
-        # 创建临时draw对象来计算文本尺寸
-        temp_img = Image.new('RGBA', (1, 1), (0, 0, 0, 0))
-        temp_draw = ImageDraw.Draw(temp_img)
-        # 获取文本尺寸 - 使用textbbox替代textsize
-        bbox = temp_draw.textbbox((0, 0), watermark_text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        # 设置水印位置
-        margin = 10  # 边距
-        if isinstance(position, tuple) and len(position) == 2 and all(isinstance(p, float) for p in position):
-            # 如果是相对坐标元组 (rel_x, rel_y)，计算实际像素位置
-            rel_x, rel_y = position
-            # 确保坐标在有效范围内 (0-1)
-            rel_x = max(0, min(1, rel_x))
-            rel_y = max(0, min(1, rel_y))
-            # 计算实际像素位置（考虑文本大小，使文本中心位于指定坐标）
-            x = int(rel_x * width - text_width / 2)
-            y = int(rel_y * height - text_height / 2)
-            # 确保位置在图片范围内
-            x = max(0, min(x, width - text_width))
-            y = max(0, min(y, height - text_height))
-            position_val = (x, y)
-        elif position is None or (isinstance(position, str) and position.lower() == 'top-left'):
-            # 左上角
-            position_val = (margin, margin)
-        elif isinstance(position, str) and position.lower() == 'top-right':
-            # 右上角
-            position_val = (width - text_width - margin, margin)
-        elif isinstance(position, str) and position.lower() == 'center':
-            # 中央位置
-            position_val = ((width - text_width) // 2, (height - text_height) // 2)
-        elif isinstance(position, str) and position.lower() == 'bottom-left':
-            # 左下角
-            position_val = (margin, height - text_height - margin)
-        elif isinstance(position, str) and position.lower() == 'bottom-right':
-            # 右下角
-            position_val = (width - text_width - margin, height - text_height - margin)
-        else:
-            # 默认左上角
-            position_val = DEFAULT_WATERMARK_POSITION
-        
-        # 1. 创建一个和原图一样大的透明图层（rgba全为0）
-        watermark_layer = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-        
-        # 2. 在透明图层上，只以rgb绘制水印文字
-        draw_watermark = ImageDraw.Draw(watermark_layer)
-        draw_watermark.text(position_val, watermark_text, font=font, fill=color_val)
-        
-        # 3. 调整水印图层的不透明度
-        if transparency is not None:
-            # 确保透明度在有效范围内
-            transparency_val = max(0, min(100, transparency))
-            # 计算透明度因子（100代表完全透明，0代表完全不透明）
-            alpha_factor = (100 - transparency_val) / 100.0
-            
-            # 创建一个新的图层来保存调整后的透明度
-            adjusted_watermark = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-            for x in range(width):
-                for y in range(height):
-                    r, g, b, a = watermark_layer.getpixel((x, y))
-                    # 如果该像素不是透明的（即有文字的部分）
-                    if a > 0:
-                        # 调整透明度
-                        new_alpha = int(a * alpha_factor)
-                        # 保持RGB值不变，只调整alpha通道
-                        adjusted_watermark.putpixel((x, y), (r, g, b, new_alpha))
-            
-            watermark_layer = adjusted_watermark
-        
-        # 4. 将水印图层与原图合并
-        result = Image.alpha_composite(image, watermark_layer)
-        
-        # 保存处理后的图片
-        # 优先使用传入的extension参数，如果没有则从文件路径获取
-        if extension:
-            output_format = extension.lower()
-        else:
-            # 从文件路径获取扩展名并转换为小写
-            _, output_format = os.path.splitext(output_path)
-            output_format = output_format.lower()
-            # 去除可能的点号前缀
-            if output_format.startswith('.'):
-                output_format = output_format[1:]
-        
-        # 检查是否为JPEG格式，如果是则转换为RGB模式
-        if output_format in ['jpg', 'jpeg']:
-            # JPEG不支持透明度，需要转换为RGB模式
-            result = result.convert('RGB')
-            result.save(output_path, 'JPEG')
-        elif output_format == 'png':
-            # PNG支持透明度，保持RGBA模式
-            result.save(output_path, 'PNG')
-        else:
-            # 其他格式，使用默认保存方式
-            result.save(output_path)
-        
-        print(f"已成功添加水印并保存到: {output_path}")
-        return True
+        # 未提供水印方案时，按本次参数编译
+        if plan is None:
+            plan = compile_watermark_plan(
+                watermark_text, position, font_size, color, transparency
+            )
     except Exception as e:
         print(f"添加水印时出错: {e}")
-        return False
\ No newline at end of file
+        return False
+    return watermark_file(
+        image_path, output_path, plan, watermark_text, extension, encoder_options
+    )